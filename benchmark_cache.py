@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos formatos de serialização do cache: bytes em disco e tempo de
+gravação/leitura de todas as entradas
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from src.utils.cache_backends import JSONFileBackend
+from src.utils.serializers import Serializer
+
+# (nome, formato, compressão); None = JSON indentado do formato antigo
+CONFIGURACOES = [
+    ("json indentado (legado)", None, None),
+    ("json", "json", "none"),
+    ("json + gzip", "json", "gzip"),
+    ("json + zstd", "json", "zstd"),
+    ("msgpack", "msgpack", "none"),
+    ("msgpack + gzip", "msgpack", "gzip"),
+    ("msgpack + zstd", "msgpack", "zstd"),
+]
+
+
+def gerar_entrada(i: int) -> dict:
+    """Entrada sintética no formato de empresa_completa"""
+    cnpj = f"{i:014d}"
+    balancos = [
+        {
+            "periodo": str(2019 + ano),
+            "patrimonio_liquido": random.uniform(1e3, 1e6),
+            "ativo_total": random.uniform(1e3, 1e6),
+            "passivo_total": random.uniform(1e3, 1e6),
+            "divida_bruta": random.uniform(0, 1e5),
+            "divida_liquida": random.uniform(0, 1e5),
+            "receita_liquida": random.uniform(1e3, 1e6),
+            "ebitda": random.uniform(1e2, 1e5),
+            "lucro_liquido": random.uniform(-1e4, 1e5),
+            "margem_ebitda": random.uniform(0, 60),
+            "roe": random.uniform(-10, 40),
+            "roa": random.uniform(-5, 20),
+        }
+        for ano in range(5)
+    ]
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "cnpj": cnpj,
+        "endpoint": "empresa_completa",
+        "data": {
+            "cnpj": cnpj,
+            "razao_social": f"Empresa Exemplo {i} S.A.",
+            "nome_fantasia": f"Exemplo {i}",
+            "segmento": "Energia Elétrica",
+            "setor": "Utilidade Pública",
+            "subsetor": "Energia Elétrica",
+            "atividade_principal": "Geração de energia elétrica",
+            "situacao_cadastral": "ATIVA",
+            "data_abertura": "1990-01-01",
+            "capital_social": random.uniform(1e5, 1e9),
+            "endereco": {
+                "logradouro": "Av. Paulista",
+                "numero": str(i),
+                "complemento": None,
+                "bairro": "Bela Vista",
+                "cep": "01310-100",
+                "municipio": "São Paulo",
+                "uf": "SP",
+            },
+            "telefone": "(11) 3000-1000",
+            "email": f"contato@exemplo{i}.com.br",
+            "ticker": "EXMP3",
+            "bolsa": "B3",
+            "balanco_patrimonial": balancos,
+        },
+    }
+
+
+def tamanho_diretorio(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory))
+
+
+def medir(nome, formato, compressao, entradas, directory):
+    if formato is None:
+        inicio = time.perf_counter()
+        os.makedirs(directory)
+        for i, entrada in enumerate(entradas):
+            path = os.path.join(directory, f"{i}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(entrada, f, ensure_ascii=False, indent=2)
+        gravacao = time.perf_counter() - inicio
+        backend = JSONFileBackend(directory, Serializer("json"))
+    else:
+        backend = JSONFileBackend(directory, Serializer(formato, compressao))
+        inicio = time.perf_counter()
+        for i, entrada in enumerate(entradas):
+            backend.save(str(i), entrada)
+        gravacao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lidas = sum(1 for _ in backend.scan())
+    leitura = time.perf_counter() - inicio
+    assert lidas == len(entradas)
+
+    return nome, tamanho_diretorio(directory), gravacao, leitura
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=2000, help="Número de entradas")
+    args = parser.parse_args()
+
+    random.seed(42)
+    entradas = [gerar_entrada(i) for i in range(args.n)]
+
+    print(f"📦 {args.n} entradas por formato\n")
+    print(
+        f"{'Formato':<26}{'Bytes':>14}{'x legado':>10}{'Grava (s)':>12}{'Lê (s)':>10}"
+    )
+    print("-" * 72)
+
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (nome, formato, compressao) in enumerate(CONFIGURACOES):
+            try:
+                nome, tamanho, gravacao, leitura = medir(
+                    nome, formato, compressao, entradas, os.path.join(tmp, str(i))
+                )
+            except ImportError as e:
+                print(f"{nome:<26}indisponível: {e}")
+                continue
+            base = base or tamanho
+            print(
+                f"{nome:<26}{tamanho:>14,}{tamanho / base:>10.2f}"
+                f"{gravacao:>12.3f}{leitura:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
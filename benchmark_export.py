@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark da exportação CSV: implementação anterior (duas passadas, colunas
+pela união das chaves) contra o exportador de esquema fixo em uma passada
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+from benchmark_cache import gerar_entrada
+from src.utils.exporters import export_to_csv
+
+
+def export_to_csv_legado(cached_data: List[Dict], output_path: str):
+    """export_to_csv anterior: exige a lista inteira e grava os campos
+    aninhados como repr"""
+    all_fields = set()
+    for item in cached_data:
+        if "data" in item:
+            all_fields.update(item["data"].keys())
+
+    fieldnames = ["cnpj", "timestamp", "endpoint"] + sorted(all_fields)
+
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+
+        for item in cached_data:
+            if "data" in item:
+                row = {
+                    "cnpj": item.get("cnpj", ""),
+                    "timestamp": item.get("timestamp", ""),
+                    "endpoint": item.get("endpoint", ""),
+                }
+                row.update(item["data"])
+                writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=20000, help="Número de entradas")
+    args = parser.parse_args()
+
+    random.seed(42)
+    entradas = [gerar_entrada(i) for i in range(args.n)]
+
+    implementacoes = [
+        ("legado", lambda path: export_to_csv_legado(entradas, path)),
+        ("esquema (empresa)", lambda path: export_to_csv(iter(entradas), path)),
+        (
+            "esquema (periodo)",
+            lambda path: export_to_csv(iter(entradas), path, layout="periodo"),
+        ),
+    ]
+
+    print(f"📦 {args.n} entradas\n")
+    print(f"{'Exportador':<22}{'Tempo (s)':>12}{'Registros/s':>14}{'Bytes':>14}")
+    print("-" * 62)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (nome, exportar) in enumerate(implementacoes):
+            path = os.path.join(tmp, f"{i}.csv")
+            inicio = time.perf_counter()
+            exportar(path)
+            tempo = time.perf_counter() - inicio
+            print(
+                f"{nome:<22}{tempo:>12.3f}{args.n / tempo:>14,.0f}"
+                f"{os.path.getsize(path):>14,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
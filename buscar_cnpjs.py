@@ -6,10 +6,13 @@ Script para buscar CNPJs reais de diferentes segmentos da B3
 import pandas as pd
 from src.services.empresa_service import EmpresaService
 from src.utils.logger import logger
-from src.utils.helpers import format_cnpj
-import time
+from src.utils.helpers import format_cnpj, normalize_cnpj
+from src.utils.validators import is_valid_cnpj
+from config.settings import settings
 
-# Lista de CNPJs conhecidos de diferentes segmentos
+# Lista de CNPJs conhecidos de diferentes segmentos. Parte deles (sobretudo em
+# Mineração) não passa na validação dos dígitos verificadores: esses são
+# ignorados na busca e contados no resumo de cada segmento
 CNPJS_POR_SEGMENTO = {
     # "Bancos": [
     #     "60746948000112",  # Bradesco
@@ -119,37 +122,54 @@ def buscar_cnpjs_por_segmento():
     """Busca CNPJs de diferentes segmentos"""
     service = EmpresaService()
 
-    total_empresas = sum(len(cnpjs) for cnpjs in CNPJS_POR_SEGMENTO.values())
-    empresas_processadas = 0
-
+    # CNPJs repetidos (no mesmo segmento ou em segmentos diferentes) são
+    # buscados uma única vez
+    vistos = {}
+    cnpjs_por_segmento = {}
+    invalidos_por_segmento = {}
     for segmento, cnpjs in CNPJS_POR_SEGMENTO.items():
-        print(f"\n🔍 Buscando segmento: {segmento}")
+        unicos = [
+            c for c in dict.fromkeys(map(normalize_cnpj, cnpjs)) if c not in vistos
+        ]
+        vistos.update(dict.fromkeys(unicos))
+        cnpjs_por_segmento[segmento] = [c for c in unicos if is_valid_cnpj(c)]
+        invalidos_por_segmento[segmento] = len(unicos) - len(
+            cnpjs_por_segmento[segmento]
+        )
+
+    # Um único lote para todos os segmentos: a concorrência não é
+    # interrompida na troca de segmento
+    validos = [c for cnpjs in cnpjs_por_segmento.values() for c in cnpjs]
+    total_empresas = len(validos)
+    total_invalidos = sum(invalidos_por_segmento.values())
+    print(
+        f"\n🔍 Buscando {total_empresas} CNPJs de "
+        f"{len(cnpjs_por_segmento)} segmentos"
+    )
+    if total_invalidos:
+        print(f"⚠️  {total_invalidos} CNPJs inválidos ignorados")
+    resultados = {}
+    for cnpj, empresa in service.buscar_empresas_em_lote(validos):
+        resultados[cnpj] = empresa
+        print(f"   📈 Progresso: {len(resultados)}/{total_empresas} empresas")
+
+    for segmento, cnpjs in cnpjs_por_segmento.items():
+        print(f"\n📂 Segmento: {segmento}")
         print(f"📊 Total de CNPJs: {len(cnpjs)}")
+        if invalidos_por_segmento[segmento]:
+            print(f"⚠️  Inválidos ignorados: {invalidos_por_segmento[segmento]}")
         print("=" * 50)
 
         for i, cnpj in enumerate(cnpjs, 1):
-            try:
-                print(f"{i:2d}/{len(cnpjs)} - Buscando CNPJ: {format_cnpj(cnpj)}")
-                empresa = service.buscar_empresa_por_cnpj(cnpj)
-
-                if empresa:
-                    print(f"   ✅ Encontrado: {empresa.razao_social}")
-                else:
-                    print(f"   ❌ Não encontrado ou erro na busca")
-
-                empresas_processadas += 1
-                print(
-                    f"   📈 Progresso: {empresas_processadas}/{total_empresas} empresas"
-                )
-
-                # Delay para não sobrecarregar as APIs
-                time.sleep(1)
+            print(f"{i:2d}/{len(cnpjs)} - CNPJ: {format_cnpj(cnpj)}")
 
-            except Exception as e:
-                print(f"   ⚠️  Erro ao buscar CNPJ {cnpj}: {e}")
-                continue
+            empresa = resultados.get(cnpj)
+            if empresa:
+                print(f"   ✅ Encontrado: {empresa.razao_social}")
+            else:
+                print(f"   ❌ Não encontrado ou erro na busca")
 
-    print(f"\n🎯 Busca concluída! {empresas_processadas} empresas processadas.")
+    print(f"\n🎯 Busca concluída! {len(resultados)} empresas processadas.")
 
 
 def listar_empresas_em_cache():
@@ -172,8 +192,7 @@ def listar_empresas_em_cache():
 
 if __name__ == "__main__":
     print("🚀 Iniciando busca de CNPJs por segmento...")
-    print("⏰ Isso pode levar alguns minutos devido aos delays entre requisições")
-    print("💤 Delay de 1 segundo entre cada busca para não sobrecarregar as APIs")
+    print(f"⚡ Até {settings.BATCH_MAX_CONCURRENCY} buscas simultâneas")
     print("=" * 60)
 
     buscar_cnpjs_por_segmento()
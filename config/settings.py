@@ -10,15 +10,125 @@ class Settings:
     RECEITAWS_BASE_URL = os.getenv("RECEITAWS_BASE_URL")
     BRASIL_API_BASE_URL = os.getenv("BRASIL_API_BASE_URL")
 
+    # Arquivo local (CSV ou Parquet) com emissores, segmentos e financeiros da B3
+    B3_DATA_FILE = os.getenv("B3_DATA_FILE")
+
     # App Configs
     REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 30))
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", 3))
     CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    # "json" (um arquivo por chave em CACHE_DIR) ou "sqlite" (CACHE_DB_PATH)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "json").lower()
+    CACHE_DB_TIMEOUT = float(os.getenv("CACHE_DB_TIMEOUT", 30))
+    # Formato das entradas gravadas: "json" ou "msgpack", com compressão
+    # "none", "gzip" ou "zstd". Entradas em outro formato continuam legíveis
+    CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "json").lower()
+    CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "none").lower()
+    # fsync antes de renomear cada entrada: sobrevive a quedas de energia, a
+    # custo de gravações mais lentas
+    CACHE_FSYNC = os.getenv("CACHE_FSYNC", "false").lower() == "true"
+    # Camada LRU em memória na frente do cache em disco (0 entradas desativa;
+    # 0 bytes = sem limite de tamanho)
+    MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", 1024))
+    MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_BYTES", 0))
+
+    # Validade do cache em segundos, por endpoint (CACHE_TTL_DEFAULT para os
+    # demais). Entradas vencidas há menos de CACHE_STALE_SECONDS ainda são
+    # devolvidas e atualizadas em segundo plano (stale-while-revalidate)
+    CACHE_TTL_DEFAULT = int(os.getenv("CACHE_TTL_DEFAULT", 86400))
+
+    # Cache negativo: CNPJs que nenhum provedor resolveu, com validade curta
+    # conforme o motivo
+    NEGATIVE_CACHE_ENABLED = (
+        os.getenv("NEGATIVE_CACHE_ENABLED", "true").lower() == "true"
+    )
+    NEGATIVE_CACHE_TTL = {
+        "nao_encontrado": int(os.getenv("NEGATIVE_CACHE_TTL_NAO_ENCONTRADO", 21600)),
+        "invalido": int(os.getenv("NEGATIVE_CACHE_TTL_INVALIDO", 86400)),
+        "erro_provedor": int(os.getenv("NEGATIVE_CACHE_TTL_ERRO_PROVEDOR", 600)),
+    }
+
+    CACHE_TTL = {
+        "empresa_completa": int(
+            os.getenv("CACHE_TTL_EMPRESA_COMPLETA", CACHE_TTL_DEFAULT)
+        ),
+        # Cada entrada negativa vale pelo TTL do seu motivo
+        "negativo": max(NEGATIVE_CACHE_TTL.values()),
+    }
+    CACHE_STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", 7 * 86400))
+    CACHE_REFRESH_WORKERS = int(os.getenv("CACHE_REFRESH_WORKERS", 2))
+
+    # Limites do cache em disco (0 = sem limite). "cache prune" e as gravações
+    # (a cada CACHE_PRUNE_INTERVAL, 0 desativa) removem as entradas já fora
+    # da janela de stale e, acima dos limites, as primeiras pela política
+    # CACHE_EVICTION_POLICY: "lru" (menos acessadas) ou "oldest" (mais antigas)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 0))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 0))
+    CACHE_EVICTION_POLICY = os.getenv("CACHE_EVICTION_POLICY", "lru").lower()
+    CACHE_PRUNE_INTERVAL = int(os.getenv("CACHE_PRUNE_INTERVAL", 500))
+    # Guarda as respostas brutas de cada provedor (RAW_CACHE_DIR ou a tabela
+    # "raw" do SQLite) para reconstruir as empresas sem consultar a rede
+    RAW_CACHE_ENABLED = os.getenv("RAW_CACHE_ENABLED", "true").lower() == "true"
+    # As respostas brutas não vencem (são a fonte do rebuild); só estes
+    # limites (0 = sem limite) as removem, com a mesma política de eviction
+    RAW_CACHE_MAX_ENTRIES = int(os.getenv("RAW_CACHE_MAX_ENTRIES", 0))
+    RAW_CACHE_MAX_BYTES = int(os.getenv("RAW_CACHE_MAX_BYTES", 0))
+    REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", 4))
+    # Threads que leem e decodificam as entradas nas varreduras do cache
+    CACHE_SCAN_WORKERS = int(os.getenv("CACHE_SCAN_WORKERS", 4))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 10))
+    FINANCIAL_WORKERS = int(os.getenv("FINANCIAL_WORKERS", 4))
+
+    # HTTP (pool de conexões keep-alive e timeouts em segundos)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 20))
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 4))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", REQUEST_TIMEOUT))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+
+    # Rate limiting (requisições por segundo e burst por provedor; 0 desativa)
+    BRASIL_API_RATE_LIMIT = float(os.getenv("BRASIL_API_RATE_LIMIT", 3))
+    BRASIL_API_RATE_BURST = float(os.getenv("BRASIL_API_RATE_BURST", 5))
+    RECEITAWS_RATE_LIMIT = float(os.getenv("RECEITAWS_RATE_LIMIT", 0.05))
+    RECEITAWS_RATE_BURST = float(os.getenv("RECEITAWS_RATE_BURST", 3))
+    RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", 0.5))
+    RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", 30))
+
+    # Hedging: dispara o provedor de fallback se o primário demorar mais que o
+    # percentil HEDGE_PERCENTILE das latências observadas (ou HEDGE_DELAY
+    # segundos enquanto houver menos de LATENCY_MIN_SAMPLES amostras)
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+    HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", 2))
+    LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", 200))
+    LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", 10))
+
+    # Circuit breaker por provedor: abre quando a taxa de erros ou de chamadas
+    # lentas na janela passa do limite e testa de novo após CIRCUIT_OPEN_SECONDS
+    CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", 120))
+    CIRCUIT_MIN_REQUESTS = int(os.getenv("CIRCUIT_MIN_REQUESTS", 5))
+    CIRCUIT_ERROR_THRESHOLD = float(os.getenv("CIRCUIT_ERROR_THRESHOLD", 0.5))
+    CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", 10))
+    CIRCUIT_SLOW_CALL_THRESHOLD = float(os.getenv("CIRCUIT_SLOW_CALL_THRESHOLD", 0.8))
+    CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", 60))
+    CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", 1))
 
     # Paths
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     DATA_DIR = os.path.join(BASE_DIR, "data")
     CACHE_DIR = os.path.join(DATA_DIR, "cache")
+    # Respostas brutas dos provedores, base do comando rebuild
+    RAW_CACHE_DIR = os.path.join(DATA_DIR, "raw")
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(DATA_DIR, "cache.sqlite3"))
+    # Dataset Parquet acumulado pela exportação incremental
+    EXPORT_INCREMENTAL_DIR = os.getenv(
+        "EXPORT_INCREMENTAL_DIR",
+        os.path.join(DATA_DIR, "processed", "empresas_incremental"),
+    )
+    # A exportação incremental só inclui entradas com mais de N segundos: o
+    # timestamp é gerado antes da gravação, que pode esperar travas de outros
+    # processos; o atraso deve superar a espera mais longa de uma gravação
+    EXPORT_WATERMARK_LAG = float(os.getenv("EXPORT_WATERMARK_LAG", 300))
 
 
 settings = Settings()
@@ -3,12 +3,10 @@
 Script para criar dados de exemplo para Bancos, Mineração e Energia
 """
 
-import json
 import os
-import hashlib
-from datetime import datetime
 import numpy as np
 from config.settings import settings
+from src.utils.helpers import save_to_cache
 
 
 def criar_dados_multisetor():
@@ -197,23 +195,7 @@ def criar_dados_multisetor():
             }
 
             # Salva no cache
-            cache_key = hashlib.md5(
-                f"{empresa['cnpj']}_empresa_completa".encode()
-            ).hexdigest()
-            cache_path = os.path.join(settings.CACHE_DIR, f"{cache_key}.json")
-
-            with open(cache_path, "w", encoding="utf-8") as f:
-                json.dump(
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "cnpj": empresa["cnpj"],
-                        "endpoint": "empresa_completa",
-                        "data": dados_empresa,
-                    },
-                    f,
-                    ensure_ascii=False,
-                    indent=2,
-                )
+            save_to_cache(empresa["cnpj"], "empresa_completa", dados_empresa)
 
             print(f"✅ {empresa['nome']}")
             total_empresas += 1
@@ -5,18 +5,26 @@ Sistema de Análise Financeira por CNPJ
 
 import argparse
 import json
+from typing import Optional
 from rich.console import Console
 from rich.table import Table
 from rich import box
 
+from config.settings import settings
+from src.api_clients.brasil_api_client import BrasilAPIClient
+from src.api_clients.receitaws_client import ReceitaWSClient
 from src.services.empresa_service import EmpresaService
 from src.services.cache_service import CacheService
 from src.services.analise_service import AnaliseService
 from src.utils.helpers import ensure_directories, format_cnpj
 from src.utils.logger import logger
+from src.utils.validators import is_valid_cnpj
+from src.utils.provider_stats import get_circuit_breaker, get_latency_tracker
 
 console = Console()
 
+PROVEDORES_CADASTRAIS = [BrasilAPIClient.provider_name, ReceitaWSClient.provider_name]
+
 
 def main():
     ensure_directories()
@@ -34,22 +42,87 @@ def main():
         default="table",
         help="Formato de saída",
     )
+    search_parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Consulta também o provedor de fallback se o primário demorar",
+    )
+    search_parser.add_argument(
+        "--bypass-negative-cache",
+        action="store_true",
+        help="Consulta os provedores mesmo se o CNPJ estiver no cache negativo",
+    )
 
     # Comando export
     export_parser = subparsers.add_parser("export", help="Exportar dados do cache")
     export_parser.add_argument(
         "--format",
         "-f",
-        choices=["json", "csv", "xlsx"],
-        default="json",
-        help="Formato de exportação",
+        choices=["json", "jsonl", "parquet", "csv", "xlsx"],
+        help="Formato de exportação (padrão: json; parquet com --incremental)",
     )
     export_parser.add_argument("--output", "-o", help="Arquivo de saída (opcional)")
+    export_parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Comprime a saída com gzip (formatos json, jsonl e csv)",
+    )
+    export_parser.add_argument(
+        "--layout",
+        choices=["empresa", "periodo"],
+        default="empresa",
+        help="Linhas do CSV: uma por empresa ou uma por período de balanço",
+    )
+    export_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Acrescenta ao dataset Parquet só o que mudou desde a última "
+        "exportação incremental",
+    )
 
     # Comando cache
     cache_parser = subparsers.add_parser("cache", help="Gerenciar cache")
     cache_parser.add_argument(
-        "action", choices=["list", "stats", "clear"], help="Ação a executar"
+        "action",
+        choices=["list", "stats", "clear", "migrate", "convert", "reindex", "prune"],
+        help=(
+            "Ação a executar (migrate importa o cache JSON para o SQLite; "
+            "convert regrava as entradas no formato de CACHE_SERIALIZER; "
+            "reindex reconstrói o manifesto usado por list e stats; "
+            "prune remove entradas vencidas e acima dos limites)"
+        ),
+    )
+    cache_parser.add_argument(
+        "--max-entries", type=int, help="Limite de entradas para o prune"
+    )
+    cache_parser.add_argument(
+        "--max-bytes", type=int, help="Limite de bytes para o prune"
+    )
+    cache_parser.add_argument(
+        "--policy", choices=["lru", "oldest"], help="Política de eviction do prune"
+    )
+    cache_parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="prune: poda a camada de respostas brutas (limites RAW_CACHE_MAX_*); "
+        "clear: também apaga as respostas brutas usadas pelo rebuild",
+    )
+
+    # Comando rebuild
+    rebuild_parser = subparsers.add_parser(
+        "rebuild",
+        help="Reconstrói as empresas em cache a partir das respostas brutas",
+    )
+    rebuild_parser.add_argument(
+        "--workers", type=int, help="Número de threads (padrão: REBUILD_WORKERS)"
+    )
+
+    # Comando health
+    health_parser = subparsers.add_parser(
+        "health", help="Estado dos circuit breakers dos provedores"
+    )
+    health_parser.add_argument(
+        "--reset", action="store_true", help="Fecha os circuitos de todos os provedores"
     )
 
     # Comando analyze
@@ -77,21 +150,37 @@ def main():
     args = parser.parse_args()
 
     if args.command == "search":
-        buscar_empresa(args.cnpj, args.output)
+        buscar_empresa(args.cnpj, args.output, args.hedge, args.bypass_negative_cache)
     elif args.command == "export":
-        exportar_cache(args.format, args.output)
+        formato = args.format or ("parquet" if args.incremental else "json")
+        exportar_cache(formato, args.output, args.gzip, args.layout, args.incremental)
     elif args.command == "cache":
-        gerenciar_cache(args.action)
+        gerenciar_cache(
+            args.action, args.max_entries, args.max_bytes, args.policy, args.raw
+        )
+    elif args.command == "rebuild":
+        reconstruir_empresas(args.workers)
+    elif args.command == "health":
+        exibir_saude_provedores(args.reset)
     elif args.command == "analyze":
         analisar_dados(args)
     else:
         parser.print_help()
 
 
-def buscar_empresa(cnpj: str, output_format: str):
+def buscar_empresa(
+    cnpj: str,
+    output_format: str,
+    hedge: bool = False,
+    ignorar_cache_negativo: bool = False,
+):
     """Busca e exibe dados de uma empresa"""
-    service = EmpresaService()
-    empresa = service.buscar_empresa_por_cnpj(cnpj)
+    if not is_valid_cnpj(cnpj):
+        console.print(f"[red]❌ CNPJ {format_cnpj(cnpj)} inválido[/red]")
+        return
+
+    service = EmpresaService(hedge=hedge or None)
+    empresa = service.buscar_empresa_por_cnpj(cnpj, ignorar_cache_negativo)
 
     if not empresa:
         console.print(
@@ -105,10 +194,20 @@ def buscar_empresa(cnpj: str, output_format: str):
         exibir_empresa_tabela(empresa)
 
 
-def exportar_cache(format: str, output_file: str):
+def exportar_cache(
+    format: str,
+    output_file: str,
+    compress: bool = False,
+    layout: str = "empresa",
+    incremental: bool = False,
+):
     """Exporta dados do cache"""
+    if incremental and format != "parquet":
+        console.print("[red]❌ A exportação incremental usa o formato parquet[/red]")
+        return
+
     service = CacheService()
-    success = service.export_cache(format, output_file)
+    success = service.export_cache(format, output_file, compress, layout, incremental)
 
     if success:
         console.print(
@@ -118,7 +217,13 @@ def exportar_cache(format: str, output_file: str):
         console.print("[red]❌ Erro ao exportar cache[/red]")
 
 
-def gerenciar_cache(action: str):
+def gerenciar_cache(
+    action: str,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    policy: Optional[str] = None,
+    raw: bool = False,
+):
     """Gerencia o cache"""
     service = CacheService()
 
@@ -145,12 +250,86 @@ def gerenciar_cache(action: str):
         console.print_json(data=stats)
 
     elif action == "clear":
-        success = service.clear_cache()
+        success = service.clear_cache(raw)
         if success:
             console.print("[green]✅ Cache limpo com sucesso[/green]")
         else:
             console.print("[red]❌ Erro ao limpar cache[/red]")
 
+    elif action == "migrate":
+        total = service.migrate_json_to_sqlite()
+        console.print(
+            f"[green]✅ {total} entradas importadas para o cache SQLite[/green]"
+        )
+        if settings.CACHE_BACKEND != "sqlite":
+            console.print(
+                "[yellow]⚠️  Defina CACHE_BACKEND=sqlite para usar o novo cache[/yellow]"
+            )
+
+    elif action == "convert":
+        total = service.convert_cache()
+        console.print(
+            f"[green]✅ {total} entradas regravadas em "
+            f"{settings.CACHE_SERIALIZER}/{settings.CACHE_COMPRESSION}[/green]"
+        )
+
+    elif action == "reindex":
+        total = service.reindex_cache()
+        console.print(f"[green]✅ Manifesto reconstruído com {total} entradas[/green]")
+
+    elif action == "prune":
+        resultado = service.prune_cache(max_entries, max_bytes, policy, raw)
+        console.print(
+            f"[green]✅ {resultado['expiradas']} entradas vencidas e "
+            f"{resultado['removidas']} acima dos limites removidas[/green]"
+        )
+
+
+def reconstruir_empresas(workers: Optional[int] = None):
+    """Regenera os registros de empresas offline a partir da camada bruta"""
+    total, reconstruidas = EmpresaService().reconstruir_empresas(workers)
+    if not total:
+        console.print("[yellow]⚠️  Nenhuma resposta bruta em cache[/yellow]")
+        return
+    console.print(
+        f"[green]✅ {reconstruidas} de {total} empresas reconstruídas "
+        "a partir das respostas brutas[/green]"
+    )
+
+
+def exibir_saude_provedores(reset: bool = False):
+    """Exibe o estado dos circuit breakers e latências de cada provedor"""
+    table = Table(title="🩺 Saúde dos Provedores", box=box.ROUNDED)
+    table.add_column("Provedor", style="cyan")
+    table.add_column("Circuito", style="bold")
+    table.add_column("Saúde", style="green")
+    table.add_column("Requisições", style="yellow")
+    table.add_column("Erros", style="red")
+    table.add_column("Lentas", style="red")
+    table.add_column("p50 / p95", style="magenta")
+
+    cores = {"closed": "green", "half_open": "yellow", "open": "red"}
+    for provedor in PROVEDORES_CADASTRAIS:
+        breaker = get_circuit_breaker(provedor)
+        if reset:
+            breaker.reset()
+        snapshot = breaker.snapshot()
+        cor = cores[snapshot["state"]]
+        latency = get_latency_tracker(provedor)
+        p50 = latency.percentile(50)
+        p95 = latency.percentile(95)
+        table.add_row(
+            provedor,
+            f"[{cor}]{snapshot['state']}[/{cor}]",
+            f"{snapshot['health']:.2f}",
+            str(snapshot["requests"]),
+            f"{snapshot['error_rate']:.0%}",
+            f"{snapshot['slow_rate']:.0%}",
+            f"{p50:.2f}s / {p95:.2f}s" if p50 is not None else "N/A",
+        )
+
+    console.print(table)
+
 
 def analisar_dados(args):
     """Executa análise de dados"""
@@ -246,11 +425,14 @@ def exibir_empresa_tabela(empresa):
 
     # Balanço Patrimonial
     if empresa.balanco_patrimonial:
-        table_balanco = Table(title="💰 Balanço Patrimonial (2023)", box=box.ROUNDED)
+        table_balanco = Table(title="💰 Balanço Patrimonial", box=box.ROUNDED)
         table_balanco.add_column("Indicador", style="cyan")
         table_balanco.add_column("Valor (R$ milhões)", style="green")
 
         for balanco in empresa.balanco_patrimonial:
+            table_balanco.add_row(
+                "[bold]Período[/bold]", f"[bold]{balanco.periodo}[/bold]"
+            )
             if balanco.patrimonio_liquido:
                 table_balanco.add_row(
                     "Patrimônio Líquido", f"R$ {balanco.patrimonio_liquido:,.2f}"
@@ -0,0 +1,191 @@
+import csv
+import math
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from src.utils.helpers import normalize_cnpj
+
+# Colunas financeiras (valores em milhões de R$) armazenadas por período
+FINANCIAL_FIELDS = (
+    "patrimonio_liquido",
+    "divida_liquida",
+    "receita_liquida",
+    "lucro_liquido",
+    "ebitda",
+    "ativo_total",
+    "passivo_total",
+)
+
+# Período atribuído aos dados financeiros que não informam o seu
+PERIODO_PADRAO = "2023"
+
+
+def _texto(valor) -> Optional[str]:
+    """Normaliza textos repetidos (segmento, setor...) compartilhando a instância"""
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return sys.intern(valor) if valor else None
+
+
+def _numero(valor) -> float:
+    if valor is None or valor == "":
+        return math.nan
+    return float(valor)
+
+
+class EmpresaListada:
+    """Registro compacto (com __slots__) de um emissor listado na B3"""
+
+    __slots__ = ("cnpj", "ticker", "nome", "segmento", "setor", "subsetor")
+
+    def __init__(self, cnpj, ticker, nome, segmento, setor, subsetor):
+        self.cnpj = cnpj
+        self.ticker = ticker
+        self.nome = nome
+        self.segmento = segmento
+        self.setor = setor
+        self.subsetor = subsetor
+
+    def to_dict(self) -> Dict:
+        return {
+            "ticker": self.ticker,
+            "nome": self.nome,
+            "segmento": self.segmento,
+            "setor": self.setor,
+            "subsetor": self.subsetor,
+        }
+
+
+class SerieFinanceira:
+    """Períodos financeiros de todos os tickers em colunas ``array('d')``.
+
+    As linhas ficam agrupadas por ticker e ordenadas por período, de modo que
+    cada ticker ocupa uma faixa contígua [início, fim). Valores ausentes são
+    guardados como NaN.
+    """
+
+    def __init__(self, linhas: Iterable[Tuple[str, str, Tuple[float, ...]]]):
+        self.periodos: List[str] = []
+        self.colunas = {field: array("d") for field in FINANCIAL_FIELDS}
+        self._faixas: Dict[str, Tuple[int, int]] = {}
+
+        for ticker, periodo, valores in sorted(linhas, key=lambda l: (l[0], l[1])):
+            inicio, _ = self._faixas.get(ticker, (len(self.periodos), 0))
+            self.periodos.append(periodo)
+            for field, valor in zip(FINANCIAL_FIELDS, valores):
+                self.colunas[field].append(valor)
+            self._faixas[ticker] = (inicio, len(self.periodos))
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._faixas
+
+    def periodos_do_ticker(self, ticker: str) -> List[Dict]:
+        """Períodos do ticker, do mais antigo para o mais recente"""
+        inicio, fim = self._faixas.get(ticker, (0, 0))
+        resultado = []
+        for i in range(inicio, fim):
+            periodo = {"periodo": self.periodos[i]}
+            for field in FINANCIAL_FIELDS:
+                valor = self.colunas[field][i]
+                periodo[field] = None if math.isnan(valor) else valor
+            resultado.append(periodo)
+        return resultado
+
+
+class B3ReferenceIndex:
+    """Índices em memória dos dados de referência das empresas listadas.
+
+    Construído uma única vez: CNPJs são normalizados na carga e as consultas
+    por CNPJ, ticker ou segmento são buscas em dicionário.
+    """
+
+    def __init__(
+        self, empresas: Iterable[EmpresaListada], financeiros: SerieFinanceira
+    ):
+        self.por_cnpj: Dict[str, EmpresaListada] = {}
+        self.por_ticker: Dict[str, EmpresaListada] = {}
+        self.por_segmento: Dict[str, List[str]] = {}
+        self.financeiros = financeiros
+
+        for empresa in empresas:
+            if empresa.ticker in self.por_ticker:
+                continue
+            self.por_cnpj.setdefault(empresa.cnpj, empresa)
+            self.por_ticker[empresa.ticker] = empresa
+            self.por_segmento.setdefault(empresa.segmento, []).append(empresa.ticker)
+
+    @classmethod
+    def from_builtin(
+        cls, empresas: List[Dict], segmentos: Dict, financeiros: Dict
+    ) -> "B3ReferenceIndex":
+        """Constrói o índice a partir das tabelas embutidas no código"""
+        registros = []
+        for company in empresas:
+            ticker = company.get("ticker")
+            segmento_info = segmentos.get(ticker, {})
+            registros.append(
+                EmpresaListada(
+                    normalize_cnpj(company.get("cnpj", "")),
+                    ticker,
+                    company.get("name"),
+                    _texto(segmento_info.get("segmento")),
+                    _texto(segmento_info.get("setor")),
+                    _texto(segmento_info.get("subsetor")),
+                )
+            )
+        linhas = [
+            (
+                ticker,
+                PERIODO_PADRAO,
+                tuple(_numero(valores.get(f)) for f in FINANCIAL_FIELDS),
+            )
+            for ticker, valores in financeiros.items()
+        ]
+        return cls(registros, SerieFinanceira(linhas))
+
+    @classmethod
+    def from_file(cls, path: str) -> "B3ReferenceIndex":
+        """Constrói o índice a partir de um arquivo CSV ou Parquet.
+
+        Uma linha por (ticker, período) com as colunas cnpj, ticker, nome,
+        segmento, setor, subsetor, periodo e as colunas de FINANCIAL_FIELDS.
+        Linhas sem período trazem apenas os dados cadastrais do emissor.
+        """
+        registros = {}
+        linhas = []
+        for row in _ler_linhas(path):
+            ticker = _texto(row.get("ticker"))
+            if not ticker:
+                continue
+            if ticker not in registros:
+                registros[ticker] = EmpresaListada(
+                    normalize_cnpj(row.get("cnpj") or ""),
+                    ticker,
+                    _texto(row.get("nome")),
+                    _texto(row.get("segmento")),
+                    _texto(row.get("setor")),
+                    _texto(row.get("subsetor")),
+                )
+            periodo = _texto(row.get("periodo"))
+            valores = tuple(_numero(row.get(f)) for f in FINANCIAL_FIELDS)
+            if periodo or not all(math.isnan(v) for v in valores):
+                linhas.append((ticker, periodo or PERIODO_PADRAO, valores))
+        return cls(registros.values(), SerieFinanceira(linhas))
+
+
+def _ler_linhas(path: str) -> Iterator[Dict]:
+    """Itera as linhas de um arquivo CSV ou Parquet como dicionários"""
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                "pyarrow é necessário para ler dados da B3 em Parquet "
+                "(pip install pyarrow)"
+            )
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
@@ -0,0 +1,271 @@
+import asyncio
+import time
+import aiohttp
+import requests
+from typing import Dict, Optional, Tuple
+from config.settings import settings
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.helpers import save_raw_response
+from src.utils.http_session import get_session, get_timeout
+from src.utils.logger import logger
+from src.utils.provider_stats import get_circuit_breaker, get_latency_tracker
+from src.utils.rate_limiter import backoff_delay, get_rate_limiter, parse_retry_after
+
+# Status HTTP que indicam falha transitória e justificam nova tentativa
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Motivos pelos quais uma consulta não trouxe dados
+MOTIVO_NAO_ENCONTRADO = "nao_encontrado"
+MOTIVO_INVALIDO = "invalido"
+MOTIVO_ERRO_PROVEDOR = "erro_provedor"
+
+
+def _status_http(error: Exception) -> Optional[int]:
+    status = getattr(error, "status", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = error.response.status_code
+    return status
+
+
+class BaseAPIClient:
+    """Base comum para os clientes HTTP de dados cadastrais"""
+
+    provider_name = ""
+    display_name = ""
+
+    def __init__(
+        self, base_url: str, rate_limit: float, rate_burst: Optional[float] = None
+    ):
+        self.base_url = base_url
+        self.rate_limiter = get_rate_limiter(base_url, rate_limit, rate_burst)
+        self.latency = get_latency_tracker(self.provider_name)
+        self.circuit_breaker = get_circuit_breaker(self.provider_name)
+
+    def is_available(self) -> bool:
+        """Indica se o circuit breaker do provedor aceita requisições agora"""
+        return self.circuit_breaker.is_available()
+
+    def _build_url(self, cnpj: str) -> str:
+        raise NotImplementedError
+
+    def _parse_response(self, data: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+        """Retorna (dados, motivo) a partir do JSON de uma resposta 2xx"""
+        return data, None
+
+    def _motivo_falha(self, error: Exception) -> Optional[str]:
+        """Classifica a exceção de uma consulta num dos motivos MOTIVO_*; None
+        se a requisição nem foi feita (circuito aberto)"""
+        if isinstance(error, CircuitOpenError):
+            return None
+        status = _status_http(error)
+        if status == 404:
+            return MOTIVO_NAO_ENCONTRADO
+        if status in (400, 422):
+            return MOTIVO_INVALIDO
+        return MOTIVO_ERRO_PROVEDOR
+
+    def consultar(
+        self, cnpj: str, enviada=None, reservado: bool = False
+    ) -> Tuple[Optional[Dict], Optional[str]]:
+        """Busca o CNPJ e retorna (dados, motivo); motivo é None quando há dados.
+
+        ``enviada`` (um Event) é sinalizado quando a requisição sai, depois da
+        espera no rate limiter; com ``reservado``, a primeira tentativa usa um
+        token já obtido com ``try_acquire``.
+        """
+        try:
+            data = self._get_json(self._build_url(cnpj), enviada, reservado)
+            dados, motivo = self._parse_response(data)
+        except Exception as e:
+            logger.error(f"Erro ao buscar CNPJ na {self.display_name}: {e}")
+            return None, self._motivo_falha(e)
+        self._salvar_resposta_bruta(cnpj, dados)
+        return dados, motivo
+
+    async def consultar_async(
+        self, session, cnpj: str, enviada=None, reservado: bool = False
+    ) -> Tuple[Optional[Dict], Optional[str]]:
+        """Versão assíncrona de consultar"""
+        try:
+            data = await self._get_json_async(
+                session, self._build_url(cnpj), enviada, reservado
+            )
+            dados, motivo = self._parse_response(data)
+        except Exception as e:
+            logger.error(f"Erro ao buscar CNPJ na {self.display_name}: {e}")
+            return None, self._motivo_falha(e)
+        self._salvar_resposta_bruta(cnpj, dados)
+        return dados, motivo
+
+    def _salvar_resposta_bruta(self, cnpj: str, dados: Optional[Dict]):
+        """Guarda a resposta na camada bruta; falhas aqui não afetam a consulta"""
+        if not dados:
+            return
+        try:
+            save_raw_response(self.provider_name, cnpj, dados)
+        except Exception as e:
+            logger.warning(f"Erro ao salvar resposta bruta da {self.display_name}: {e}")
+
+    def get_company_by_cnpj(self, cnpj: str) -> Optional[Dict]:
+        """Busca dados básicos da empresa por CNPJ"""
+        return self.consultar(cnpj)[0]
+
+    async def get_company_by_cnpj_async(self, session, cnpj: str) -> Optional[Dict]:
+        """Versão assíncrona de get_company_by_cnpj"""
+        return (await self.consultar_async(session, cnpj))[0]
+
+    def _record_error(self, error: Exception):
+        """Registra no circuit breaker a falha de uma requisição"""
+        status = _status_http(error)
+        if status is not None and 400 <= status < 500 and status != 429:
+            # Erros 4xx (ex.: CNPJ inexistente) indicam que o provedor respondeu
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+
+    def _retry_delay(
+        self, status: int, retry_after: Optional[str], attempt: int, deadline: float
+    ) -> Optional[float]:
+        """Retorna a espera antes de repetir a requisição ou None se não deve
+        repetir (status não transitório, tentativas esgotadas, Retry-After acima
+        de RETRY_BACKOFF_MAX ou espera além do prazo da consulta)"""
+        if status not in RETRYABLE_STATUS or attempt >= settings.MAX_RETRIES:
+            return None
+
+        pedido = parse_retry_after(retry_after)
+        if pedido is not None and pedido > settings.RETRY_BACKOFF_MAX:
+            # Melhor seguir para o próximo provedor do que esperar tanto
+            logger.warning(
+                f"{self.provider_name}: HTTP {status} com Retry-After de "
+                f"{pedido:.0f}s, desistindo deste provedor"
+            )
+            return None
+
+        delay = backoff_delay(attempt, pedido)
+        if time.monotonic() + delay >= deadline:
+            return None
+        logger.warning(
+            f"{self.provider_name}: HTTP {status}, nova tentativa em {delay:.1f}s "
+            f"({attempt + 1}/{settings.MAX_RETRIES})"
+        )
+        # A pausa vale para o provedor inteiro, não só para esta requisição
+        self.rate_limiter.pause(delay)
+        return delay
+
+    def _get_json(self, url: str, enviada=None, reservado: bool = False) -> Dict:
+        """Executa um GET síncrono protegido pelo circuit breaker e retorna o JSON"""
+        self.circuit_breaker.before_request()
+        try:
+            data, elapsed = self._request_json(url, enviada, reservado)
+        except Exception as e:
+            self._record_error(e)
+            raise
+        except BaseException:
+            self.circuit_breaker.release()
+            raise
+        self.circuit_breaker.record_success(elapsed)
+        return data
+
+    async def _get_json_async(
+        self, session, url: str, enviada=None, reservado: bool = False
+    ) -> Dict:
+        """Versão assíncrona (aiohttp) de _get_json"""
+        self.circuit_breaker.before_request()
+        try:
+            data, elapsed = await self._request_json_async(
+                session, url, enviada, reservado
+            )
+        except Exception as e:
+            self._record_error(e)
+            raise
+        except BaseException:
+            # Inclui o cancelamento da requisição perdedora no hedging
+            self.circuit_breaker.release()
+            raise
+        self.circuit_breaker.record_success(elapsed)
+        return data
+
+    def _request_json(
+        self, url: str, enviada=None, reservado: bool = False
+    ) -> Tuple[Dict, float]:
+        """Executa o GET com rate limiting e retentativas; retorna (JSON, latência).
+
+        Só erros de conexão, 429 e 5xx são repetidos, e o total de tentativas
+        fica limitado a REQUEST_TIMEOUT. Timeouts de leitura não são repetidos:
+        um provedor que não responde deve cair logo no fallback.
+        """
+        deadline = time.monotonic() + settings.REQUEST_TIMEOUT
+        for attempt in range(settings.MAX_RETRIES + 1):
+            if not (reservado and attempt == 0):
+                self.rate_limiter.acquire()
+            if enviada is not None:
+                enviada.set()
+            started = time.monotonic()
+            try:
+                response = get_session().get(url, timeout=get_timeout())
+            except requests.ConnectionError as e:
+                # Inclui ConnectTimeout; ReadTimeout não é ConnectionError
+                delay = backoff_delay(attempt)
+                if (
+                    attempt >= settings.MAX_RETRIES
+                    or time.monotonic() + delay >= deadline
+                ):
+                    raise
+                logger.warning(f"{self.provider_name}: {e}, tentando novamente")
+                time.sleep(delay)
+                continue
+
+            delay = self._retry_delay(
+                response.status_code,
+                response.headers.get("Retry-After"),
+                attempt,
+                deadline,
+            )
+            if delay is not None:
+                continue
+
+            response.raise_for_status()
+            data = response.json()
+            elapsed = time.monotonic() - started
+            self.latency.record(elapsed)
+            return data, elapsed
+
+    async def _request_json_async(
+        self, session, url: str, enviada=None, reservado: bool = False
+    ) -> Tuple[Dict, float]:
+        """Versão assíncrona (aiohttp) de _request_json"""
+        deadline = time.monotonic() + settings.REQUEST_TIMEOUT
+        for attempt in range(settings.MAX_RETRIES + 1):
+            if not (reservado and attempt == 0):
+                await self.rate_limiter.acquire_async()
+            if enviada is not None:
+                enviada.set()
+            started = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    delay = self._retry_delay(
+                        response.status,
+                        response.headers.get("Retry-After"),
+                        attempt,
+                        deadline,
+                    )
+                    if delay is not None:
+                        continue
+
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                    elapsed = time.monotonic() - started
+                    self.latency.record(elapsed)
+                    return data, elapsed
+            except asyncio.TimeoutError:
+                # ServerTimeoutError também é ClientConnectionError
+                raise
+            except aiohttp.ClientConnectionError as e:
+                delay = backoff_delay(attempt)
+                if (
+                    attempt >= settings.MAX_RETRIES
+                    or time.monotonic() + delay >= deadline
+                ):
+                    raise
+                logger.warning(f"{self.provider_name}: {e}, tentando novamente")
+                await asyncio.sleep(delay)
@@ -1,24 +1,18 @@
-import requests
-from typing import Optional, Dict
 from config.settings import settings
-from src.utils.logger import logger
-from src.utils.helpers import format_cnpj
+from src.api_clients.base_client import BaseAPIClient
 
 
-class BrasilAPIClient:
-    def __init__(self):
-        self.base_url = settings.BRASIL_API_BASE_URL
-
-    def get_company_by_cnpj(self, cnpj: str) -> Optional[Dict]:
-        """Busca dados básicos da empresa por CNPJ"""
-        try:
-            formatted_cnpj = "".join(filter(str.isdigit, cnpj))
-            url = f"{self.base_url}/cnpj/v1/{formatted_cnpj}"
+class BrasilAPIClient(BaseAPIClient):
+    provider_name = "brasilapi"
+    display_name = "BrasilAPI"
 
-            response = requests.get(url, timeout=settings.REQUEST_TIMEOUT)
-            response.raise_for_status()
+    def __init__(self):
+        super().__init__(
+            settings.BRASIL_API_BASE_URL,
+            settings.BRASIL_API_RATE_LIMIT,
+            settings.BRASIL_API_RATE_BURST,
+        )
 
-            return response.json()
-        except Exception as e:
-            logger.error(f"Erro ao buscar CNPJ na BrasilAPI: {e}")
-            return None
+    def _build_url(self, cnpj: str) -> str:
+        formatted_cnpj = "".join(filter(str.isdigit, cnpj))
+        return f"{self.base_url}/cnpj/v1/{formatted_cnpj}"
@@ -1,27 +1,32 @@
-import requests
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from config.settings import settings
-from src.utils.logger import logger
+from src.api_clients.base_client import (
+    BaseAPIClient,
+    MOTIVO_INVALIDO,
+    MOTIVO_NAO_ENCONTRADO,
+)
 
 
-class ReceitaWSClient:
-    def __init__(self):
-        self.base_url = settings.RECEITAWS_BASE_URL
-
-    def get_company_by_cnpj(self, cnpj: str) -> Optional[Dict]:
-        """Busca dados da empresa na ReceitaWS"""
-        try:
-            formatted_cnpj = "".join(filter(str.isdigit, cnpj))
-            url = f"{self.base_url}/cnpj/{formatted_cnpj}"
+class ReceitaWSClient(BaseAPIClient):
+    provider_name = "receitaws"
+    display_name = "ReceitaWS"
 
-            response = requests.get(url, timeout=settings.REQUEST_TIMEOUT)
-            response.raise_for_status()
+    def __init__(self):
+        super().__init__(
+            settings.RECEITAWS_BASE_URL,
+            settings.RECEITAWS_RATE_LIMIT,
+            settings.RECEITAWS_RATE_BURST,
+        )
 
-            data = response.json()
-            if data.get("status") == "ERROR":
-                return None
+    def _build_url(self, cnpj: str) -> str:
+        formatted_cnpj = "".join(filter(str.isdigit, cnpj))
+        return f"{self.base_url}/cnpj/{formatted_cnpj}"
 
-            return data
-        except Exception as e:
-            logger.error(f"Erro ao buscar CNPJ na ReceitaWS: {e}")
-            return None
+    def _parse_response(self, data: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+        if data.get("status") == "ERROR":
+            # A ReceitaWS responde 200 com status ERROR e uma mensagem
+            mensagem = str(data.get("message", "")).lower()
+            if "inválido" in mensagem or "invalido" in mensagem:
+                return None, MOTIVO_INVALIDO
+            return None, MOTIVO_NAO_ENCONTRADO
+        return data, None
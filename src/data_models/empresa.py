@@ -1,7 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Optional, List, Dict
 from datetime import datetime
 
+# Campos do dicionário de endereço montado a partir dos provedores
+ENDERECO_CAMPOS = (
+    "logradouro",
+    "numero",
+    "complemento",
+    "bairro",
+    "cep",
+    "municipio",
+    "uf",
+)
+
 
 @dataclass
 class BalancoPatrimonial:
@@ -38,6 +49,18 @@ class Empresa:
     bolsa: Optional[str]
     balanco_patrimonial: List[BalancoPatrimonial]
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Empresa":
+        """Reconstrói a empresa a partir de um dicionário no formato de to_dict"""
+        campos = {f.name: data.get(f.name) for f in fields(cls)}
+        campos["balanco_patrimonial"] = [
+            BalancoPatrimonial(
+                **{f.name: balanco.get(f.name) for f in fields(BalancoPatrimonial)}
+            )
+            for balanco in data.get("balanco_patrimonial") or []
+        ]
+        return cls(**campos)
+
     def to_dict(self) -> Dict:
         return {
             "cnpj": self.cnpj,
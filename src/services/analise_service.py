@@ -14,7 +14,7 @@ import json
 import os
 from datetime import datetime
 
-from src.utils.helpers import get_all_cached_data
+from src.utils.helpers import iter_cached_data
 from src.utils.logger import logger
 from config.settings import settings
 
@@ -23,7 +23,6 @@ console = Console()
 
 class AnaliseService:
     def __init__(self):
-        self.cached_data = get_all_cached_data()
         self.output_dir = os.path.join(settings.DATA_DIR, "plots")
         os.makedirs(self.output_dir, exist_ok=True)
 
@@ -31,7 +30,7 @@ class AnaliseService:
         """Converte dados do cache para DataFrame"""
         rows = []
 
-        for item in self.cached_data:
+        for item in iter_cached_data(endpoint="empresa_completa"):
             if "data" in item and "balanco_patrimonial" in item["data"]:
                 for balanco in item["data"]["balanco_patrimonial"]:
                     row = {
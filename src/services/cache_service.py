@@ -1,5 +1,18 @@
-from typing import List, Dict
-from src.utils.helpers import get_all_cached_data, combine_cache_data
+from typing import List, Dict, Optional
+from config.settings import settings
+from src.utils.cache_backends import (
+    JSONFileBackend,
+    SQLiteBackend,
+    get_cache_backend,
+    get_raw_cache_backend,
+    migrate_cache,
+)
+from src.utils.helpers import (
+    NEGATIVE_CACHE_ENDPOINT,
+    combine_cache_data,
+    clear_cache,
+    prune_cache,
+)
 from src.utils.logger import logger
 
 
@@ -8,72 +21,104 @@ class CacheService:
         pass
 
     def list_cached_empresas(self) -> List[Dict]:
-        """Lista todas as empresas em cache"""
-        cached_data = get_all_cached_data()
-        empresas = []
-
-        for item in cached_data:
-            if "data" in item and "razao_social" in item["data"]:
-                empresas.append(
-                    {
-                        "cnpj": item.get("cnpj", ""),
-                        "razao_social": item["data"]["razao_social"],
-                        "timestamp": item.get("timestamp", ""),
-                        "endpoint": item.get("endpoint", ""),
-                    }
-                )
-
-        return empresas
+        """Lista todas as empresas em cache (lidas do manifesto)"""
+        return [
+            {
+                "cnpj": item["cnpj"],
+                "razao_social": item["razao_social"],
+                "segmento": item["segmento"],
+                "timestamp": item["timestamp"],
+                "endpoint": item["endpoint"],
+            }
+            for item in get_cache_backend().iter_manifest()
+            if item["razao_social"]
+        ]
 
     def export_cache(
-        self, output_format: str = "json", output_file: str = None
+        self,
+        output_format: str = "json",
+        output_file: str = None,
+        compress: bool = False,
+        layout: str = "empresa",
+        incremental: bool = False,
     ) -> bool:
         """Exporta cache para o formato especificado"""
         logger.info(f"Exportando cache para formato {output_format}")
-        return combine_cache_data(output_format, output_file)
-
-    def clear_cache(self) -> bool:
-        """Limpa todo o cache"""
-        from config.settings import settings
-        import shutil
-        import os
+        return combine_cache_data(
+            output_format, output_file, compress, layout, incremental
+        )
 
+    def clear_cache(self, raw: bool = False) -> bool:
+        """Limpa todo o cache (e, com ``raw``, as respostas brutas)"""
         try:
-            if os.path.exists(settings.CACHE_DIR):
-                shutil.rmtree(settings.CACHE_DIR)
-                os.makedirs(settings.CACHE_DIR)
-                logger.info("Cache limpo com sucesso")
-                return True
+            clear_cache(raw)
+            logger.info("Cache limpo com sucesso")
+            return True
         except Exception as e:
             logger.error(f"Erro ao limpar cache: {e}")
             return False
 
+    def migrate_json_to_sqlite(self) -> int:
+        """Importa o diretório de cache JSON para o banco SQLite"""
+        total = migrate_cache(
+            JSONFileBackend(settings.CACHE_DIR), SQLiteBackend(settings.CACHE_DB_PATH)
+        )
+        logger.info(f"{total} entradas importadas para {settings.CACHE_DB_PATH}")
+        return total
+
+    def convert_cache(self) -> int:
+        """Regrava o cache no formato configurado em CACHE_SERIALIZER/CACHE_COMPRESSION"""
+        total = get_cache_backend().convert()
+        logger.info(
+            f"{total} entradas convertidas para "
+            f"{settings.CACHE_SERIALIZER}/{settings.CACHE_COMPRESSION}"
+        )
+        return total
+
     def get_cache_stats(self) -> Dict:
         """Retorna estatísticas do cache"""
-        cached_data = get_all_cached_data()
+        backend = get_cache_backend()
+        resumo = backend.manifest_summary()
+        empresas = backend.manifest_summary("empresa_completa")
+        negativos = backend.manifest_summary(NEGATIVE_CACHE_ENDPOINT)
+        brutas = get_raw_cache_backend().manifest_summary()
 
         return {
-            "total_empresas": len(cached_data),
-            "empresas_unicas": len(set(item.get("cnpj", "") for item in cached_data)),
-            "periodo_cache": self._get_cache_period(cached_data),
+            "total_empresas": empresas["total"],
+            "empresas_unicas": empresas["cnpjs_unicos"],
+            "cache_negativo": negativos["total"],
+            "total_entradas": resumo["total"],
+            "tamanho_bytes": resumo["bytes"],
+            "periodo_cache": {
+                "mais_antigo": resumo["mais_antigo"],
+                "mais_recente": resumo["mais_recente"],
+            },
+            "eviction": backend.manifest.counters(),
+            "respostas_brutas": {
+                "total_entradas": brutas["total"],
+                "tamanho_bytes": brutas["bytes"],
+            },
         }
 
-    def _get_cache_period(self, cached_data: List[Dict]) -> Dict:
-        """Retorna o período do cache"""
-        if not cached_data:
-            return {"mais_antigo": None, "mais_recente": None}
+    def prune_cache(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Dict[str, int]:
+        """Remove entradas vencidas e aplica os limites de tamanho do cache
+        (com ``raw``, da camada de respostas brutas)"""
+        resultado = prune_cache(max_entries, max_bytes, policy, raw)
+        logger.info(
+            f"Cache {'bruto ' if raw else ''}podado: "
+            f"{resultado['expiradas']} entradas vencidas e "
+            f"{resultado['removidas']} acima dos limites removidas"
+        )
+        return resultado
 
-        timestamps = [
-            item.get("timestamp", "") for item in cached_data if item.get("timestamp")
-        ]
-        if not timestamps:
-            return {"mais_antigo": None, "mais_recente": None}
-
-        from datetime import datetime
-
-        dates = [datetime.fromisoformat(ts) for ts in timestamps]
-
-        return {
-            "mais_antigo": min(dates).isoformat(),
-            "mais_recente": max(dates).isoformat(),
-        }
+    def reindex_cache(self) -> int:
+        """Reconstrói o manifesto do cache a partir das entradas"""
+        total = get_cache_backend().rebuild_manifest()
+        logger.info(f"Manifesto do cache reconstruído com {total} entradas")
+        return total
@@ -1,36 +1,296 @@
-from typing import Optional, List
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Iterable,
+    Iterator,
+    Optional,
+    List,
+    Set,
+    Tuple,
+)
+from config.settings import settings
+from src.api_clients.base_client import (
+    MOTIVO_ERRO_PROVEDOR,
+    MOTIVO_INVALIDO,
+    MOTIVO_NAO_ENCONTRADO,
+)
 from src.api_clients.brasil_api_client import BrasilAPIClient
 from src.api_clients.receitaws_client import ReceitaWSClient
 from src.api_clients.b3_client import B3Client
 from src.data_models.empresa import Empresa, BalancoPatrimonial
-from src.utils.helpers import load_from_cache, save_to_cache, format_cnpj
+from src.utils.helpers import (
+    NEGATIVE_CACHE_ENDPOINT,
+    delete_from_cache,
+    iter_raw_cnpjs,
+    load_raw_response,
+    load_from_cache_with_status,
+    load_negative_cache,
+    save_negative_cache,
+    save_raw_response,
+    save_to_cache,
+    format_cnpj,
+    normalize_cnpj,
+)
+from src.utils.http_session import create_async_session
 from src.utils.logger import logger
+from src.utils.single_flight import SingleFlight
+from src.utils.validators import is_valid_cnpj, validate_cnpjs
+
+# Nome da B3 na camada de respostas brutas
+PROVEDOR_B3 = "b3"
 
 
 class EmpresaService:
-    def __init__(self):
+    # Compartilhado entre instâncias: buscas simultâneas do mesmo CNPJ, em
+    # qualquer thread, aguardam a mesma requisição em andamento. A chave inclui
+    # ignorar_cache_negativo: quem pede para ignorar o cache negativo não pode
+    # receber o resultado de uma busca que o respeitou
+    _buscas_em_andamento = SingleFlight()
+
+    # Atualizações em segundo plano de entradas de cache vencidas
+    # (stale-while-revalidate), no máximo uma por CNPJ
+    _revalidacoes = ThreadPoolExecutor(
+        max_workers=settings.CACHE_REFRESH_WORKERS, thread_name_prefix="revalidacao"
+    )
+    _revalidando: Set[str] = set()
+    _revalidando_lock = threading.Lock()
+
+    # Requisições da busca síncrona com hedging (primária e secundária), sobre
+    # o pool de conexões da sessão compartilhada
+    _hedges = ThreadPoolExecutor(
+        max_workers=settings.HTTP_POOL_SIZE, thread_name_prefix="hedge"
+    )
+
+    def __init__(self, hedge: Optional[bool] = None):
         self.brasil_api = BrasilAPIClient()
         self.receitaws = ReceitaWSClient()
         self.b3_client = B3Client()
+        self.hedge = settings.HEDGE_ENABLED if hedge is None else hedge
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.FINANCIAL_WORKERS, thread_name_prefix="b3"
+        )
 
-    def buscar_empresa_por_cnpj(self, cnpj: str) -> Optional[Empresa]:
-        """Busca dados completos de uma empresa por CNPJ"""
+    def buscar_empresa_por_cnpj(
+        self, cnpj: str, ignorar_cache_negativo: bool = False
+    ) -> Optional[Empresa]:
+        """Busca dados completos de uma empresa por CNPJ.
+
+        CNPJs que nenhum provedor resolveu recentemente ficam no cache negativo
+        e retornam None sem nova consulta, a menos que ``ignorar_cache_negativo``.
+        """
+        cnpj = normalize_cnpj(cnpj)
+        if not is_valid_cnpj(cnpj):
+            logger.error(f"CNPJ inválido: {format_cnpj(cnpj)}")
+            return None
+        return self._buscas_em_andamento.do(
+            f"{cnpj}:{ignorar_cache_negativo}",
+            self._buscar_empresa,
+            cnpj,
+            ignorar_cache_negativo,
+        )
+
+    def _buscar_empresa(
+        self, cnpj: str, ignorar_cache_negativo: bool = False
+    ) -> Optional[Empresa]:
+        """Executa a busca de fato (cache, provedores e montagem da empresa)"""
         logger.info(f"Buscando dados para CNPJ: {format_cnpj(cnpj)}")
 
         # Tenta carregar do cache primeiro
-        cached_data = load_from_cache(cnpj, "empresa_completa")
-        if cached_data:
+        empresa = self._empresa_do_cache(cnpj)
+        if empresa:
             logger.info("Dados encontrados em cache")
-            return Empresa(**cached_data)
+            return empresa
+        if not ignorar_cache_negativo and self._em_cache_negativo(cnpj):
+            return None
 
-        # Busca dados das APIs
-        dados_basicos = self._buscar_dados_basicos(cnpj)
+        empresa = self._buscar_na_origem(cnpj)
+        if empresa and ignorar_cache_negativo:
+            delete_from_cache(cnpj, NEGATIVE_CACHE_ENDPOINT)
+        return empresa
+
+    def _buscar_na_origem(self, cnpj: str) -> Optional[Empresa]:
+        """Consulta os provedores e atualiza o cache"""
+        # Busca dados das APIs: cadastrais e financeiros são independentes e
+        # correm em paralelo, então a busca custa o tempo da mais lenta
+        financeiros = self._executor.submit(self._buscar_dados_financeiros, cnpj)
+        dados_basicos, motivo = self._buscar_dados_basicos(cnpj)
         if not dados_basicos:
-            logger.error("Não foi possível encontrar dados básicos da empresa")
+            financeiros.cancel()
+            logger.error(
+                f"Não foi possível encontrar dados básicos da empresa "
+                f"({motivo or 'nenhum provedor disponível'})"
+            )
+            self._registrar_negativo(cnpj, motivo)
             return None
 
-        dados_financeiros = self._buscar_dados_financeiros(cnpj)
+        dados_financeiros = financeiros.result()
+
+        return self._finalizar_empresa(cnpj, dados_basicos, dados_financeiros)
+
+    def buscar_empresas_em_lote(
+        self,
+        cnpjs: Iterable[str],
+        max_concurrency: Optional[int] = None,
+        ignorar_cache_negativo: bool = False,
+    ) -> Iterator[Tuple[str, Optional[Empresa]]]:
+        """Busca várias empresas concorrentemente via aiohttp.
+
+        Os CNPJs são normalizados, validados e deduplicados antes da busca;
+        produz uma tupla (cnpj, empresa) por CNPJ distinto, com empresa None
+        quando o CNPJ é inválido (produzidos primeiro, sem nenhuma requisição)
+        ou quando nenhum provedor retornou dados.
+        """
+        max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        cnpjs = list(cnpjs)
+        normalizados, validos = validate_cnpjs(cnpjs)
+        for cnpj in dict.fromkeys(str(c) for c, ok in zip(cnpjs, validos) if not ok):
+            logger.warning(f"CNPJ inválido ignorado: {cnpj}")
+            yield cnpj, None
+
+        cnpjs_unicos = list(dict.fromkeys(normalizados[validos].tolist()))
+        loop = asyncio.new_event_loop()
+        resultados = self._buscar_lote_async(
+            cnpjs_unicos, max_concurrency, ignorar_cache_negativo
+        )
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(resultados.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(resultados.aclose())
+            loop.close()
+
+    async def _buscar_lote_async(
+        self, cnpjs: List[str], max_concurrency: int, ignorar_cache_negativo: bool
+    ) -> AsyncIterator[Tuple[str, Optional[Empresa]]]:
+        """Executa as buscas do lote limitando o número de requisições simultâneas"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async with create_async_session() as session:
+
+            async def buscar(cnpj: str) -> Tuple[str, Optional[Empresa]]:
+                async with semaphore:
+                    try:
+                        return cnpj, await self._buscar_empresa_async(
+                            session, cnpj, ignorar_cache_negativo
+                        )
+                    except Exception as e:
+                        logger.error(f"Erro ao buscar CNPJ {format_cnpj(cnpj)}: {e}")
+                        return cnpj, None
+
+            tasks = [asyncio.ensure_future(buscar(cnpj)) for cnpj in cnpjs]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def _buscar_empresa_async(
+        self, session, cnpj: str, ignorar_cache_negativo: bool = False
+    ) -> Optional[Empresa]:
+        """Versão assíncrona de buscar_empresa_por_cnpj usada nas buscas em
+        lote; compartilha as buscas em andamento com as síncronas"""
+        return await self._buscas_em_andamento.do_async(
+            f"{cnpj}:{ignorar_cache_negativo}",
+            self._buscar_empresa_async_origem,
+            session,
+            cnpj,
+            ignorar_cache_negativo,
+        )
+
+    async def _buscar_empresa_async_origem(
+        self, session, cnpj: str, ignorar_cache_negativo: bool
+    ) -> Optional[Empresa]:
+        """Executa a busca assíncrona; o acesso ao cache (disco/SQLite) roda
+        em threads para não travar as demais buscas do lote"""
+        empresa = await _em_thread(self._empresa_do_cache, cnpj)
+        if empresa:
+            return empresa
+        if not ignorar_cache_negativo and await _em_thread(
+            self._em_cache_negativo, cnpj
+        ):
+            return None
+
+        financeiros = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._buscar_dados_financeiros, cnpj
+        )
+        (dados_basicos, motivo), dados_financeiros = await asyncio.gather(
+            self._buscar_dados_basicos_async(session, cnpj), financeiros
+        )
+        if not dados_basicos:
+            logger.error(
+                f"Não foi possível encontrar dados básicos da empresa "
+                f"{format_cnpj(cnpj)} ({motivo or 'nenhum provedor disponível'})"
+            )
+            await _em_thread(self._registrar_negativo, cnpj, motivo)
+            return None
+
+        if ignorar_cache_negativo:
+            await _em_thread(delete_from_cache, cnpj, NEGATIVE_CACHE_ENDPOINT)
+        # Inclui save_to_cache, que pode disparar a limpeza do cache
+        return await _em_thread(
+            self._finalizar_empresa, cnpj, dados_basicos, dados_financeiros
+        )
+
+    def _registrar_negativo(self, cnpj: str, motivo: Optional[str]):
+        """Grava o CNPJ no cache negativo, exceto se nenhum provedor foi
+        consultado: uma indisponibilidade geral não diz nada sobre o CNPJ"""
+        if motivo is not None:
+            save_negative_cache(cnpj, motivo)
+
+    def _em_cache_negativo(self, cnpj: str) -> bool:
+        negativo = load_negative_cache(cnpj)
+        if not negativo:
+            return False
+        logger.info(
+            f"CNPJ {format_cnpj(cnpj)} no cache negativo ({negativo['motivo']}), "
+            "consulta ignorada"
+        )
+        return True
+
+    def _empresa_do_cache(self, cnpj: str) -> Optional[Empresa]:
+        """Empresa em cache; se vencida, é devolvida e atualizada em segundo plano"""
+        cached_data, vencido = load_from_cache_with_status(cnpj, "empresa_completa")
+        if not cached_data:
+            return None
+        if vencido:
+            self._agendar_revalidacao(cnpj)
+        return Empresa.from_dict(cached_data)
 
+    def _agendar_revalidacao(self, cnpj: str):
+        """Agenda a atualização do cache do CNPJ, se ainda não houver uma"""
+        with self._revalidando_lock:
+            if cnpj in self._revalidando:
+                return
+            self._revalidando.add(cnpj)
+
+        logger.info(
+            f"Cache vencido para {format_cnpj(cnpj)}, atualizando em segundo plano"
+        )
+        self._revalidacoes.submit(self._revalidar, cnpj)
+
+    def _revalidar(self, cnpj: str):
+        try:
+            if not self._buscar_na_origem(cnpj):
+                logger.warning(
+                    f"Não foi possível atualizar o cache de {format_cnpj(cnpj)}"
+                )
+        except Exception as e:
+            logger.error(f"Erro ao atualizar cache de {format_cnpj(cnpj)}: {e}")
+        finally:
+            with self._revalidando_lock:
+                self._revalidando.discard(cnpj)
+
+    def _finalizar_empresa(
+        self, cnpj: str, dados_basicos: dict, dados_financeiros: Optional[dict]
+    ) -> Empresa:
+        """Constrói a empresa, calcula os indicadores e salva no cache"""
         # Constrói o objeto Empresa
         empresa = self._construir_empresa(dados_basicos, dados_financeiros)
 
@@ -42,20 +302,195 @@ class EmpresaService:
 
         return empresa
 
-    def _buscar_dados_basicos(self, cnpj: str) -> Optional[dict]:
-        """Busca dados básicos da empresa"""
-        # Tenta BrasilAPI primeiro
-        dados = self.brasil_api.get_company_by_cnpj(cnpj)
-        if dados:
-            return dados
+    def _provedores_disponiveis(self) -> List:
+        """Provedores cadastrais em ordem de preferência, sem os de circuito aberto"""
+        provedores = [p for p in (self.brasil_api, self.receitaws) if p.is_available()]
+        if not provedores:
+            logger.warning(
+                "Todos os provedores de dados cadastrais estão indisponíveis"
+            )
+        return provedores
 
-        # Fallback para ReceitaWS
-        dados = self.receitaws.get_company_by_cnpj(cnpj)
-        return dados
+    def _buscar_dados_basicos(self, cnpj: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Busca dados básicos da empresa; retorna (dados, motivo da falha)"""
+        provedores = self._provedores_disponiveis()
+        if self.hedge and len(provedores) > 1:
+            return self._hedge(cnpj, *provedores[:2])
+
+        # Tenta BrasilAPI primeiro, com fallback para ReceitaWS
+        motivos = []
+        for provedor in provedores:
+            dados, motivo = provedor.consultar(cnpj)
+            if dados:
+                return dados, None
+            motivos.append(motivo)
+        return None, _motivo_final(motivos)
+
+    async def _buscar_dados_basicos_async(
+        self, session, cnpj: str
+    ) -> Tuple[Optional[dict], Optional[str]]:
+        """Versão assíncrona de _buscar_dados_basicos"""
+        provedores = self._provedores_disponiveis()
+        if self.hedge and len(provedores) > 1:
+            return await self._hedge_async(session, cnpj, *provedores[:2])
+
+        motivos = []
+        for provedor in provedores:
+            dados, motivo = await provedor.consultar_async(session, cnpj)
+            if dados:
+                return dados, None
+            motivos.append(motivo)
+        return None, _motivo_final(motivos)
+
+    def _hedge(
+        self, cnpj: str, primario, secundario
+    ) -> Tuple[Optional[dict], Optional[str]]:
+        """Busca com hedging: se o provedor primário não responder dentro do
+        percentil configurado de latência, contado a partir do envio da
+        requisição, dispara também o secundário, desde que ele tenha um token
+        livre no rate limiter. O primeiro payload válido vence.
+
+        Usa threads sobre a sessão HTTP compartilhada; a requisição perdedora
+        termina em segundo plano e o resultado é descartado.
+        """
+        delay = _hedge_delay(primario)
+        enviada = threading.Event()
+        primaria = self._hedges.submit(primario.consultar, cnpj, enviada)
+        primaria.add_done_callback(lambda _: enviada.set())
+        # A espera na fila do rate limiter não conta como lentidão do provedor
+        enviada.wait()
+
+        done, _ = wait([primaria], timeout=delay)
+        if done or not secundario.rate_limiter.try_acquire():
+            dados, motivo = primaria.result()
+            if dados:
+                return dados, None
+            dados, motivo_secundario = secundario.consultar(cnpj)
+            if dados:
+                return dados, None
+            return None, _motivo_final([motivo, motivo_secundario])
+
+        logger.info(
+            f"{primario.provider_name} sem resposta em {delay:.2f}s, "
+            f"consultando também {secundario.provider_name}"
+        )
+        fallback = self._hedges.submit(secundario.consultar, cnpj, None, True)
+        motivos = []
+        for future in as_completed([primaria, fallback]):
+            dados, motivo = future.result()
+            if dados:
+                return dados, None
+            motivos.append(motivo)
+        return None, _motivo_final(motivos)
+
+    async def _hedge_async(
+        self, session, cnpj: str, primario, secundario
+    ) -> Tuple[Optional[dict], Optional[str]]:
+        """Versão assíncrona de _hedge; a requisição restante é cancelada e
+        tokens reservados que não chegaram a ser usados são devolvidos"""
+        delay = _hedge_delay(primario)
+        enviada = asyncio.Event()
+        primaria = asyncio.ensure_future(
+            primario.consultar_async(session, cnpj, enviada)
+        )
+        primaria.add_done_callback(lambda _: enviada.set())
+        try:
+            await enviada.wait()
+        except asyncio.CancelledError:
+            primaria.cancel()
+            raise
+
+        done, _ = await asyncio.wait({primaria}, timeout=delay)
+        if done or not secundario.rate_limiter.try_acquire():
+            dados, motivo = await primaria
+            if dados:
+                return dados, None
+            dados, motivo_secundario = await secundario.consultar_async(session, cnpj)
+            if dados:
+                return dados, None
+            return None, _motivo_final([motivo, motivo_secundario])
+
+        logger.info(
+            f"{primario.provider_name} sem resposta em {delay:.2f}s, "
+            f"consultando também {secundario.provider_name}"
+        )
+        enviada_fallback = asyncio.Event()
+        fallback = asyncio.ensure_future(
+            secundario.consultar_async(session, cnpj, enviada_fallback, True)
+        )
+        pending = {primaria, fallback}
+        motivos = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    dados, motivo = task.result()
+                    if dados:
+                        return dados, None
+                    motivos.append(motivo)
+            return None, _motivo_final(motivos)
+        finally:
+            for task in pending:
+                task.cancel()
+            if fallback in pending and not enviada_fallback.is_set():
+                secundario.rate_limiter.refund()
 
     def _buscar_dados_financeiros(self, cnpj: str) -> Optional[dict]:
         """Busca dados financeiros da empresa"""
-        return self.b3_client.get_company_financials(cnpj)
+        dados = self.b3_client.get_company_financials(cnpj)
+        if dados:
+            # Falhas na camada bruta não afetam a consulta
+            try:
+                save_raw_response(PROVEDOR_B3, cnpj, dados)
+            except Exception as e:
+                logger.warning(f"Erro ao salvar resposta bruta da B3: {e}")
+        return dados
+
+    def reconstruir_empresas(
+        self, max_workers: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """Regenera os registros empresa_completa a partir das respostas brutas
+        dos provedores, sem acessar a rede, em ``max_workers`` threads.
+
+        Retorna (CNPJs com respostas brutas, empresas reconstruídas).
+        """
+        provedores = [p.provider_name for p in (self.brasil_api, self.receitaws)]
+        cnpjs = list(iter_raw_cnpjs(provedores))
+        logger.info(f"Reconstruindo {len(cnpjs)} empresas a partir da camada bruta")
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or settings.REBUILD_WORKERS,
+            thread_name_prefix="rebuild",
+        ) as pool:
+            resultados = pool.map(
+                lambda cnpj: self._reconstruir_empresa(cnpj, provedores), cnpjs
+            )
+            reconstruidas = sum(1 for ok in resultados if ok)
+        return len(cnpjs), reconstruidas
+
+    def _reconstruir_empresa(self, cnpj: str, provedores: List[str]) -> bool:
+        try:
+            # Mesma preferência da busca: BrasilAPI e depois ReceitaWS
+            dados_basicos = None
+            for provedor in provedores:
+                dados_basicos = load_raw_response(provedor, cnpj)
+                if dados_basicos:
+                    break
+            if not dados_basicos:
+                return False
+
+            dados_financeiros = load_raw_response(PROVEDOR_B3, cnpj)
+            if dados_financeiros is None:
+                # Os dados da B3 são de referência local, também sem rede
+                dados_financeiros = self.b3_client.get_company_financials(cnpj)
+
+            self._finalizar_empresa(cnpj, dados_basicos, dados_financeiros)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir empresa {format_cnpj(cnpj)}: {e}")
+            return False
 
     def _construir_empresa(
         self, dados_basicos: dict, dados_financeiros: dict
@@ -105,24 +540,27 @@ class EmpresaService:
         # Prepara balanço patrimonial com valores padrão para campos opcionais
         balanco_patrimonial = []
         if dados_financeiros and "financials" in dados_financeiros:
-            financials = dados_financeiros["financials"]
-            balanco = BalancoPatrimonial(
-                periodo="2023",
-                patrimonio_liquido=financials.get("patrimonio_liquido"),
-                ativo_total=financials.get("ativo_total"),
-                passivo_total=financials.get("passivo_total"),
-                divida_bruta=financials.get(
-                    "divida_liquida"
-                ),  # Usando divida_liquida como proxy
-                divida_liquida=financials.get("divida_liquida"),
-                receita_liquida=financials.get("receita_liquida"),
-                ebitda=financials.get("ebitda"),
-                lucro_liquido=financials.get("lucro_liquido"),
-                margem_ebitda=None,  # Será calculado depois
-                roe=None,  # Será calculado depois
-                roa=None,  # Será calculado depois
-            )
-            balanco_patrimonial.append(balanco)
+            periodos = dados_financeiros.get("periodos") or [
+                dados_financeiros["financials"]
+            ]
+            for financials in periodos:
+                balanco = BalancoPatrimonial(
+                    periodo=financials.get("periodo", "2023"),
+                    patrimonio_liquido=financials.get("patrimonio_liquido"),
+                    ativo_total=financials.get("ativo_total"),
+                    passivo_total=financials.get("passivo_total"),
+                    divida_bruta=financials.get(
+                        "divida_liquida"
+                    ),  # Usando divida_liquida como proxy
+                    divida_liquida=financials.get("divida_liquida"),
+                    receita_liquida=financials.get("receita_liquida"),
+                    ebitda=financials.get("ebitda"),
+                    lucro_liquido=financials.get("lucro_liquido"),
+                    margem_ebitda=None,  # Será calculado depois
+                    roe=None,  # Será calculado depois
+                    roa=None,  # Será calculado depois
+                )
+                balanco_patrimonial.append(balanco)
 
         return Empresa(
             cnpj=dados_basicos.get("cnpj", ""),
@@ -144,3 +582,25 @@ class EmpresaService:
             bolsa="B3" if segmento_info else None,
             balanco_patrimonial=balanco_patrimonial,
         )
+
+
+def _em_thread(fn, *args) -> Awaitable:
+    """Executa uma função bloqueante no executor padrão do event loop"""
+    return asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def _hedge_delay(primario) -> float:
+    """Espera antes do hedging: percentil configurado das latências do
+    provedor primário, ou HEDGE_DELAY enquanto não houver amostras"""
+    delay = primario.latency.percentile(settings.HEDGE_PERCENTILE)
+    return settings.HEDGE_DELAY if delay is None else delay
+
+
+def _motivo_final(motivos: List[Optional[str]]) -> Optional[str]:
+    """Motivo de nenhum provedor ter resolvido o CNPJ: uma resposta definitiva
+    (inválido ou não encontrado) prevalece sobre falhas dos provedores. None
+    quando nenhum provedor chegou a ser consultado (circuitos abertos)"""
+    for motivo in (MOTIVO_INVALIDO, MOTIVO_NAO_ENCONTRADO, MOTIVO_ERRO_PROVEDOR):
+        if motivo in motivos:
+            return motivo
+    return None
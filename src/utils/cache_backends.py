@@ -0,0 +1,671 @@
+import atexit
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from config.settings import settings
+from src.utils.cache_manifest import CacheManifest, manifest_row, open_sqlite
+from src.utils.serializers import Serializer, get_serializer
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem travas consultivas entre processos
+    fcntl = None
+
+
+class CacheBackend:
+    """Interface dos backends de cache.
+
+    Cada entrada é um envelope ``{"timestamp", "cnpj", "endpoint", "data"}``
+    identificado pela chave gerada em ``get_cache_key``. Cada backend mantém
+    um ``CacheManifest`` com os metadados das entradas, atualizado a cada
+    gravação.
+    """
+
+    manifest: CacheManifest
+
+    # Acessos acumulados antes de gravar os horários no manifesto
+    ACCESS_FLUSH_SIZE = 256
+
+    def __init__(self):
+        self._acessos: Dict[str, float] = {}
+        self._acessos_lock = threading.Lock()
+
+    def save(self, key: str, entry: Dict, preserve_access: bool = False):
+        """Grava a entrada; ``preserve_access`` mantém o último acesso no
+        manifesto quando a regravação não traz dados novos"""
+        raise NotImplementedError
+
+    def save_many(
+        self, items: Iterable[Tuple[str, Dict]], preserve_access: bool = False
+    ) -> int:
+        count = 0
+        for key, entry in items:
+            self.save(key, entry, preserve_access)
+            count += 1
+        return count
+
+    def load(self, key: str) -> Optional[Dict]:
+        entry = self._load(key)
+        if entry is not None:
+            self.registrar_acesso(key)
+        return entry
+
+    def _load(self, key: str) -> Optional[Dict]:
+        """Lê a entrada sem registrar o acesso"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        return sum(1 for key in keys if self.delete(key))
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        raise NotImplementedError
+
+    def iter_keys(self) -> Iterator[str]:
+        for key, _ in self.iter_items():
+            yield key
+
+    def iter_entries(self) -> Iterator[Dict]:
+        for _, entry in self.iter_items():
+            yield entry
+
+    def scan(
+        self,
+        endpoint: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """Itera as entradas do endpoint com timestamp em [since, until)
+        (ISO; None = sem filtro) sem acumulá-las em memória"""
+        for entry in self.iter_entries():
+            if _corresponde(entry, endpoint, since, until):
+                yield entry
+
+    def clear(self):
+        raise NotImplementedError
+
+    def iter_manifest(self) -> Iterator[Dict]:
+        """Metadados de cada entrada (MANIFEST_COLUMNS), sem ler os payloads"""
+        yield from self._manifest_atualizado()
+
+    def manifest_summary(self, endpoint: Optional[str] = None) -> Dict:
+        """Totais, bytes e período do cache (ou de um endpoint) calculados
+        pelo manifesto"""
+        return self._manifest_atualizado().summary(endpoint)
+
+    def _manifest_atualizado(self) -> CacheManifest:
+        if not self.manifest.completo:
+            self.rebuild_manifest()
+        return self.manifest
+
+    def rebuild_manifest(self, batch_size: int = 1000) -> int:
+        """Reconstrói o manifesto lendo todas as entradas"""
+        # Preserva os acessos já registrados, que não estão nas entradas
+        acessos = self.manifest.accessed_times()
+        self.manifest.reset(completo=False)
+        total = 0
+        lote = []
+        for row in self._iter_manifest_rows():
+            if row[0] in acessos:
+                row = row[:-1] + (acessos[row[0]],)
+            lote.append(row)
+            if len(lote) >= batch_size:
+                self.manifest.save_many(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            self.manifest.save_many(lote)
+            total += len(lote)
+        self.manifest.marcar_completo()
+        return total
+
+    def _iter_manifest_rows(self) -> Iterator[Tuple]:
+        raise NotImplementedError
+
+    def registrar_acesso(self, key: str):
+        """Anota a leitura da chave (inclusive as servidas pelo cache em
+        memória); os horários vão ao manifesto em lote"""
+        with self._acessos_lock:
+            self._acessos[key] = time.time()
+            if len(self._acessos) < self.ACCESS_FLUSH_SIZE:
+                return
+        self.flush_accesses()
+
+    def flush_accesses(self):
+        with self._acessos_lock:
+            acessos, self._acessos = self._acessos, {}
+        if acessos:
+            self.manifest.touch_many(acessos)
+
+    def prune(
+        self,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        policy: str = "lru",
+        cutoffs: Optional[Dict[str, str]] = None,
+        default_cutoff: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """Remove as entradas gravadas antes do corte do seu endpoint e, se
+        o cache ainda passar de ``max_entries``/``max_bytes`` (0 = sem
+        limite), as primeiras na ordem da política (``lru`` ou ``oldest``).
+        """
+        self.flush_accesses()
+        manifest = self._manifest_atualizado()
+
+        expiradas = []
+        if default_cutoff:
+            expiradas = manifest.expired_keys(cutoffs or {}, default_cutoff)
+            if expiradas:
+                self.delete_many(expiradas)
+                manifest.add_counter("expiradas", len(expiradas))
+
+        removidas = manifest.eviction_candidates(policy, max_entries, max_bytes)
+        if removidas:
+            self.delete_many(removidas)
+            manifest.add_counter("removidas", len(removidas))
+
+        return {"expiradas": len(expiradas), "removidas": len(removidas)}
+
+    def convert(self, batch_size: int = 1000) -> int:
+        """Regrava todas as entradas no formato do serializador atual"""
+        keys = list(self.iter_keys())
+        total = 0
+        for inicio in range(0, len(keys), batch_size):
+            lote = []
+            for key in keys[inicio : inicio + batch_size]:
+                entry = self._load(key)
+                if entry is not None:
+                    lote.append((key, entry))
+            total += self.save_many(lote, preserve_access=True)
+        return total
+
+
+class JSONFileBackend(CacheBackend):
+    """Um arquivo por chave dentro de um diretório.
+
+    Entradas em JSON sem compressão usam a extensão ``.json``; os demais
+    formatos, ``.cache``. Ao ler uma entrada gravada em outro formato, ela é
+    regravada no formato atual (conversão preguiçosa).
+
+    As gravações vão para um arquivo temporário renomeado por cima do final
+    (``os.replace`` é atômico), então leitores nunca veem uma entrada pela
+    metade. Gravações da mesma chave entre processos são serializadas por
+    travas ``flock`` distribuídas em LOCK_SHARDS arquivos, não por uma trava
+    global.
+    """
+
+    EXTENSIONS = (".json", ".cache")
+    LOCK_SHARDS = 256
+
+    def __init__(self, directory: str, serializer: Optional[Serializer] = None):
+        super().__init__()
+        self.directory = directory
+        self.serializer = serializer or get_serializer()
+        self._outras_extensoes = tuple(
+            ext for ext in self.EXTENSIONS if ext != self.serializer.extension
+        )
+        # Fora do diretório, para sobreviver ao clear()
+        self.manifest = CacheManifest(os.path.normpath(directory) + ".manifest.sqlite3")
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}{extension}")
+
+    def _read(self, path: str) -> Dict:
+        with open(path, "rb") as f:
+            return Serializer.loads(f.read())
+
+    @contextmanager
+    def _lock(self, key: str):
+        """Trava consultiva exclusiva do shard da chave"""
+        if fcntl is None:
+            yield
+            return
+
+        lock_dir = os.path.join(self.directory, ".locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        shard = zlib.crc32(key.encode()) % self.LOCK_SHARDS
+        with open(os.path.join(lock_dir, f"{shard:03d}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_atomic(self, path: str, payload: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+                if settings.CACHE_FSYNC:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def save(self, key: str, entry: Dict, preserve_access: bool = False):
+        os.makedirs(self.directory, exist_ok=True)
+        payload = self.serializer.dumps(entry)
+        with self._lock(key):
+            self._write_atomic(self._path(key, self.serializer.extension), payload)
+            self.manifest.save_many(
+                [manifest_row(key, entry, len(payload))], preserve_access
+            )
+            # Remove a versão da entrada gravada em outro formato, se houver
+            for extension in self._outras_extensoes:
+                try:
+                    os.remove(self._path(key, extension))
+                except FileNotFoundError:
+                    pass
+
+    def _load(self, key: str) -> Optional[Dict]:
+        try:
+            return self._read(self._path(key, self.serializer.extension))
+        except FileNotFoundError:
+            pass
+
+        for extension in self._outras_extensoes:
+            try:
+                entry = self._read(self._path(key, extension))
+            except FileNotFoundError:
+                continue
+            self.save(key, entry, preserve_access=True)
+            return entry
+        return None
+
+    def delete(self, key: str) -> bool:
+        return self.delete_many([key]) > 0
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        removidos = 0
+        for key in keys:
+            with self._lock(key):
+                for extension in self.EXTENSIONS:
+                    try:
+                        os.remove(self._path(key, extension))
+                        removidos += 1
+                    except FileNotFoundError:
+                        pass
+        self.manifest.delete_many(keys)
+        return removidos
+
+    def iter_keys(self) -> Iterator[str]:
+        if not os.path.exists(self.directory):
+            return
+
+        for filename in os.listdir(self.directory):
+            key, extension = os.path.splitext(filename)
+            if extension in self.EXTENSIONS:
+                yield key
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        if not os.path.exists(self.directory):
+            return
+
+        for filename in os.listdir(self.directory):
+            key, extension = os.path.splitext(filename)
+            if extension in self.EXTENSIONS:
+                filepath = os.path.join(self.directory, filename)
+                try:
+                    yield key, self._read(filepath)
+                except FileNotFoundError:
+                    # Removida ou convertida por outro processo após o listdir
+                    continue
+                except Exception as e:
+                    print(f"Erro ao ler arquivo {filename}: {e}")
+
+    def scan(
+        self,
+        endpoint: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """Percorre o diretório com ``os.scandir`` lendo e decodificando os
+        arquivos em ``workers`` threads (CACHE_SCAN_WORKERS). Com filtros, as
+        chaves vêm do cursor do manifesto e só os arquivos correspondentes são
+        abertos, sem listar o diretório.
+        """
+        if not os.path.exists(self.directory):
+            return
+
+        if endpoint or since or until:
+            leitor = self._read_key_or_none
+            itens = self._manifest_atualizado().keys_matching(endpoint, since, until)
+        else:
+            leitor = self._read_or_none
+            itens = self._caminhos()
+
+        for entry in _map_limitado(
+            leitor, itens, workers or settings.CACHE_SCAN_WORKERS
+        ):
+            if entry is not None and _corresponde(entry, endpoint, since, until):
+                yield entry
+
+    def _caminhos(self) -> Iterator[str]:
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if os.path.splitext(dir_entry.name)[1] in self.EXTENSIONS:
+                    yield dir_entry.path
+
+    def _read_key_or_none(self, key: str) -> Optional[Dict]:
+        """Lê ``<key><ext>`` direto, no formato atual ou nos anteriores, sem a
+        conversão preguiçosa de _load"""
+        for extension in (self.serializer.extension,) + self._outras_extensoes:
+            entry = self._read_or_none(self._path(key, extension))
+            if entry is not None:
+                return entry
+        return None
+
+    def _read_or_none(self, path: str) -> Optional[Dict]:
+        try:
+            return self._read(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Erro ao ler arquivo {os.path.basename(path)}: {e}")
+            return None
+
+    def clear(self):
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.manifest.reset(completo=True)
+
+    def _iter_manifest_rows(self) -> Iterator[Tuple]:
+        if not os.path.exists(self.directory):
+            return
+
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                key, extension = os.path.splitext(dir_entry.name)
+                if extension not in self.EXTENSIONS:
+                    continue
+                try:
+                    entry = self._read(dir_entry.path)
+                    yield manifest_row(key, entry, dir_entry.stat().st_size)
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    print(f"Erro ao ler arquivo {dir_entry.name}: {e}")
+
+    def convert(self, batch_size: int = 1000) -> int:
+        total = 0
+        for key, entry in self.iter_items():
+            self.save(key, entry, preserve_access=True)
+            total += 1
+        return total
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache numa tabela SQLite em modo WAL, com cnpj/endpoint/timestamp indexados.
+
+    Cada thread usa a sua conexão; o modo WAL permite leitores concorrentes
+    enquanto um processo escreve.
+    """
+
+    def __init__(
+        self, path: str, table: str = "cache", serializer: Optional[Serializer] = None
+    ):
+        super().__init__()
+        self.path = path
+        self.table = table
+        self.serializer = serializer or get_serializer()
+        self._local = threading.local()
+        # Manifesto numa tabela do mesmo banco, gravado na mesma transação
+        self.manifest = CacheManifest(
+            path, table=f"{table}_manifest", connect=self._connect
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = open_sqlite(self.path)
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    cnpj TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    data BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_{self.table}_cnpj ON {self.table} (cnpj);
+                CREATE INDEX IF NOT EXISTS idx_{self.table}_endpoint
+                    ON {self.table} (endpoint);
+                CREATE INDEX IF NOT EXISTS idx_{self.table}_timestamp
+                    ON {self.table} (timestamp);
+                """)
+            self._local.conn = conn
+        return conn
+
+    def _to_row(self, key: str, entry: Dict) -> Tuple:
+        data = self.serializer.dumps(entry.get("data"))
+        if self.serializer.extension == ".json":
+            # JSON puro fica como texto, legível direto no banco
+            data = data.decode("utf-8")
+        return (
+            key,
+            entry.get("cnpj", ""),
+            entry.get("endpoint", ""),
+            entry.get("timestamp", ""),
+            data,
+        )
+
+    @staticmethod
+    def _to_entry(row: Tuple) -> Dict:
+        cnpj, endpoint, timestamp, data = row
+        return {
+            "timestamp": timestamp,
+            "cnpj": cnpj,
+            "endpoint": endpoint,
+            "data": (
+                json.loads(data) if isinstance(data, str) else Serializer.loads(data)
+            ),
+        }
+
+    def save(self, key: str, entry: Dict, preserve_access: bool = False):
+        self.save_many([(key, entry)], preserve_access)
+
+    def save_many(
+        self, items: Iterable[Tuple[str, Dict]], preserve_access: bool = False
+    ) -> int:
+        conn = self.manifest.connect()
+        rows = []
+        manifest_rows = []
+        for key, entry in items:
+            row = self._to_row(key, entry)
+            rows.append(row)
+            manifest_rows.append(manifest_row(key, entry, _payload_size(row[-1])))
+
+        with conn:
+            cursor = conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, cnpj, endpoint, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.manifest.upsert(conn, manifest_rows, preserve_access)
+        return cursor.rowcount
+
+    def _load(self, key: str) -> Optional[Dict]:
+        row = (
+            self._connect()
+            .execute(
+                f"SELECT cnpj, endpoint, timestamp, data FROM {self.table} WHERE key = ?",
+                (key,),
+            )
+            .fetchone()
+        )
+        if not row:
+            return None
+        return self._to_entry(row)
+
+    def delete(self, key: str) -> bool:
+        return self.delete_many([key]) > 0
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        params = [(key,) for key in keys]
+        conn = self.manifest.connect()
+        with conn:
+            cursor = conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", params)
+            conn.executemany(f"DELETE FROM {self.manifest.table} WHERE key = ?", params)
+        return cursor.rowcount
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        cursor = self._connect().execute(
+            f"SELECT key, cnpj, endpoint, timestamp, data FROM {self.table}"
+        )
+        for row in cursor:
+            yield row[0], self._to_entry(row[1:])
+
+    def scan(
+        self,
+        endpoint: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """Filtra direto na consulta (colunas indexadas) e itera o cursor"""
+        cursor = self._connect().execute(
+            f"SELECT cnpj, endpoint, timestamp, data FROM {self.table} "
+            "WHERE (:endpoint IS NULL OR endpoint = :endpoint) "
+            "AND (:since IS NULL OR timestamp >= :since) "
+            "AND (:until IS NULL OR timestamp < :until)",
+            {"endpoint": endpoint, "since": since, "until": until},
+        )
+        for row in cursor:
+            yield self._to_entry(row)
+
+    def iter_keys(self) -> Iterator[str]:
+        rows = self._connect().execute(f"SELECT key FROM {self.table}").fetchall()
+        for (key,) in rows:
+            yield key
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+        self.manifest.reset(completo=True)
+
+    def _iter_manifest_rows(self) -> Iterator[Tuple]:
+        # Em páginas por rowid: o manifesto é gravado na mesma conexão
+        ultimo = 0
+        while True:
+            rows = (
+                self._connect()
+                .execute(
+                    f"SELECT rowid, key, cnpj, endpoint, timestamp, data "
+                    f"FROM {self.table} WHERE rowid > ? ORDER BY rowid LIMIT 1000",
+                    (ultimo,),
+                )
+                .fetchall()
+            )
+            if not rows:
+                return
+            for row in rows:
+                entry = self._to_entry(row[2:])
+                yield manifest_row(row[1], entry, _payload_size(row[-1]))
+            ultimo = rows[-1][0]
+
+
+def _payload_size(data) -> int:
+    return len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+
+
+def _corresponde(
+    entry: Dict, endpoint: Optional[str], since: Optional[str], until: Optional[str]
+) -> bool:
+    timestamp = entry.get("timestamp", "")
+    return (
+        (endpoint is None or entry.get("endpoint") == endpoint)
+        and (since is None or timestamp >= since)
+        and (until is None or timestamp < until)
+    )
+
+
+def _map_limitado(fn: Callable, itens: Iterable, workers: int) -> Iterator:
+    """``map`` em threads com no máximo ``workers * 4`` tarefas pendentes,
+    para que a memória não cresça com o número de itens"""
+    if workers <= 1:
+        yield from map(fn, itens)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        pendentes = deque()
+        try:
+            for item in itens:
+                pendentes.append(pool.submit(fn, item))
+                if len(pendentes) >= workers * 4:
+                    yield pendentes.popleft().result()
+            while pendentes:
+                yield pendentes.popleft().result()
+        finally:
+            for future in pendentes:
+                future.cancel()
+
+
+_backend: Optional[CacheBackend] = None
+_raw_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_cache_backend(kind: str, raw: bool = False) -> CacheBackend:
+    """Instancia o backend de cache ``json`` ou ``sqlite``; com ``raw``, o da
+    camada de respostas brutas dos provedores"""
+    if kind == "sqlite":
+        return SQLiteBackend(settings.CACHE_DB_PATH, table="raw" if raw else "cache")
+    if kind == "json":
+        return JSONFileBackend(settings.RAW_CACHE_DIR if raw else settings.CACHE_DIR)
+    raise ValueError(f"Backend de cache desconhecido: {kind}")
+
+
+def get_cache_backend() -> CacheBackend:
+    """Retorna o backend configurado em CACHE_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_cache_backend(settings.CACHE_BACKEND)
+            # Acessos ainda não gravados no manifesto (política LRU)
+            atexit.register(_backend.flush_accesses)
+        return _backend
+
+
+def get_raw_cache_backend() -> CacheBackend:
+    """Retorna o backend da camada bruta, do mesmo tipo de CACHE_BACKEND"""
+    global _raw_backend
+    with _backend_lock:
+        if _raw_backend is None:
+            _raw_backend = create_cache_backend(settings.CACHE_BACKEND, raw=True)
+            atexit.register(_raw_backend.flush_accesses)
+        return _raw_backend
+
+
+def migrate_cache(
+    origem: CacheBackend, destino: CacheBackend, batch_size: int = 1000
+) -> int:
+    """Copia todas as entradas de um backend para outro em lotes"""
+    total = 0
+    lote = []
+    for item in origem.iter_items():
+        lote.append(item)
+        if len(lote) >= batch_size:
+            total += destino.save_many(lote)
+            lote = []
+    if lote:
+        total += destino.save_many(lote)
+    return total
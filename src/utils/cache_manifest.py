@@ -0,0 +1,295 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from config.settings import settings
+
+# Colunas do manifesto, na ordem das linhas produzidas por manifest_row
+MANIFEST_COLUMNS = (
+    "key",
+    "cnpj",
+    "endpoint",
+    "timestamp",
+    "size",
+    "razao_social",
+    "segmento",
+    "ticker",
+    "accessed",
+)
+
+# Ordem de remoção de cada política de eviction
+EVICTION_ORDER = {"lru": "accessed", "oldest": "timestamp"}
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """Abre um banco SQLite em modo WAL (leitores concorrentes a um escritor)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=settings.CACHE_DB_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def manifest_row(
+    key: str, entry: Dict, size: int, accessed: Optional[float] = None
+) -> Tuple:
+    """Linha do manifesto de uma entrada: metadados, campos de resumo e o
+    instante do último acesso (epoch)"""
+    data = entry.get("data")
+    if not isinstance(data, dict):
+        data = {}
+    return (
+        key,
+        entry.get("cnpj", ""),
+        entry.get("endpoint", ""),
+        entry.get("timestamp", ""),
+        size,
+        data.get("razao_social"),
+        data.get("segmento"),
+        data.get("ticker"),
+        time.time() if accessed is None else accessed,
+    )
+
+
+class CacheManifest:
+    """Índice SQLite com os metadados de cada entrada do cache, sem o payload.
+
+    Permite listar e resumir o cache lendo só o manifesto. Um manifesto
+    criado para um cache já existente começa marcado como incompleto até ser
+    reconstruído pelo backend (``rebuild_manifest``).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "manifest",
+        connect: Optional[Callable[[], sqlite3.Connection]] = None,
+    ):
+        self.path = path
+        self.table = table
+        self._open = connect or (lambda: open_sqlite(self.path))
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    cnpj TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    razao_social TEXT,
+                    segmento TEXT,
+                    ticker TEXT,
+                    accessed REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_{self.table}_cnpj ON {self.table} (cnpj);
+                CREATE TABLE IF NOT EXISTS {self.table}_meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                INSERT OR IGNORE INTO {self.table}_meta (name, value)
+                    VALUES ('completo', '0'), ('expiradas', '0'), ('removidas', '0');
+                """)
+            colunas = {
+                row[1]
+                for row in conn.execute(f"PRAGMA table_info({self.table})").fetchall()
+            }
+            if "accessed" not in colunas:
+                # Manifestos anteriores à política LRU
+                with conn:
+                    conn.execute(
+                        f"ALTER TABLE {self.table} "
+                        "ADD COLUMN accessed REAL NOT NULL DEFAULT 0"
+                    )
+            self._local.conn = conn
+        return conn
+
+    def upsert(
+        self,
+        conn: sqlite3.Connection,
+        rows: Iterable[Tuple],
+        preserve_access: bool = False,
+    ):
+        """Grava as linhas na transação em curso de ``conn``. Com
+        ``preserve_access``, chaves já presentes mantêm o último acesso (para
+        regravações sem dados novos, como conversões de formato)"""
+        atualizadas = (
+            MANIFEST_COLUMNS[1:-1] if preserve_access else MANIFEST_COLUMNS[1:]
+        )
+        conn.executemany(
+            f"INSERT INTO {self.table} ({', '.join(MANIFEST_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(MANIFEST_COLUMNS))}) "
+            f"ON CONFLICT(key) DO UPDATE SET "
+            + ", ".join(f"{coluna} = excluded.{coluna}" for coluna in atualizadas),
+            rows,
+        )
+
+    def save_many(self, rows: Iterable[Tuple], preserve_access: bool = False):
+        conn = self.connect()
+        with conn:
+            self.upsert(conn, rows, preserve_access)
+
+    def delete(self, key: str):
+        self.delete_many([key])
+
+    def delete_many(self, keys: Iterable[str]):
+        conn = self.connect()
+        with conn:
+            conn.executemany(
+                f"DELETE FROM {self.table} WHERE key = ?", ((k,) for k in keys)
+            )
+
+    def touch_many(self, acessos: Dict[str, float]):
+        """Registra o último acesso de cada chave (usado pela política LRU)"""
+        conn = self.connect()
+        with conn:
+            conn.executemany(
+                f"UPDATE {self.table} SET accessed = ? WHERE key = ? AND accessed < ?",
+                ((t, k, t) for k, t in acessos.items()),
+            )
+
+    def keys_matching(
+        self,
+        endpoint: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Iterator[str]:
+        """Chaves do endpoint com timestamp em [since, until)"""
+        cursor = self.connect().execute(
+            f"SELECT key FROM {self.table} "
+            "WHERE (:endpoint IS NULL OR endpoint = :endpoint) "
+            "AND (:since IS NULL OR timestamp >= :since) "
+            "AND (:until IS NULL OR timestamp < :until)",
+            {"endpoint": endpoint, "since": since, "until": until},
+        )
+        for (key,) in cursor:
+            yield key
+
+    def accessed_times(self) -> Dict[str, float]:
+        rows = self.connect().execute(f"SELECT key, accessed FROM {self.table}")
+        return dict(rows.fetchall())
+
+    def expired_keys(self, cutoffs: Dict[str, str], default_cutoff: str) -> List[str]:
+        """Chaves gravadas antes do corte do seu endpoint (timestamps ISO)"""
+        conn = self.connect()
+        keys = []
+        for endpoint, cutoff in cutoffs.items():
+            keys.extend(
+                row[0]
+                for row in conn.execute(
+                    f"SELECT key FROM {self.table} WHERE endpoint = ? AND timestamp < ?",
+                    (endpoint, cutoff),
+                )
+            )
+        marcadores = ", ".join("?" * len(cutoffs))
+        keys.extend(
+            row[0]
+            for row in conn.execute(
+                f"SELECT key FROM {self.table} "
+                f"WHERE endpoint NOT IN ({marcadores}) AND timestamp < ?",
+                (*cutoffs, default_cutoff),
+            )
+        )
+        return keys
+
+    def eviction_candidates(
+        self, policy: str, max_entries: int, max_bytes: int
+    ) -> List[str]:
+        """Chaves a remover, na ordem da política, até respeitar os limites"""
+        if policy not in EVICTION_ORDER:
+            raise ValueError(f"Política de eviction desconhecida: {policy}")
+
+        resumo = self.summary()
+        excesso_entradas = resumo["total"] - max_entries if max_entries else 0
+        excesso_bytes = resumo["bytes"] - max_bytes if max_bytes else 0
+        keys = []
+        if excesso_entradas <= 0 and excesso_bytes <= 0:
+            return keys
+
+        cursor = self.connect().execute(
+            f"SELECT key, size FROM {self.table} ORDER BY {EVICTION_ORDER[policy]}"
+        )
+        try:
+            for key, size in cursor:
+                if excesso_entradas <= 0 and excesso_bytes <= 0:
+                    break
+                keys.append(key)
+                excesso_entradas -= 1
+                excesso_bytes -= size
+        finally:
+            cursor.close()
+        return keys
+
+    def add_counter(self, name: str, value: int):
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                f"UPDATE {self.table}_meta SET value = CAST(value AS INTEGER) + ? "
+                "WHERE name = ?",
+                (value, name),
+            )
+
+    def counters(self) -> Dict[str, int]:
+        rows = self.connect().execute(
+            f"SELECT name, value FROM {self.table}_meta WHERE name != 'completo'"
+        )
+        return {name: int(value) for name, value in rows}
+
+    @property
+    def completo(self) -> bool:
+        row = (
+            self.connect()
+            .execute(f"SELECT value FROM {self.table}_meta WHERE name = 'completo'")
+            .fetchone()
+        )
+        return bool(row) and row[0] == "1"
+
+    def reset(self, completo: bool):
+        """Esvazia o manifesto, marcando se ele já reflete o cache inteiro"""
+        conn = self.connect()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+            self._marcar(conn, completo)
+
+    def marcar_completo(self):
+        conn = self.connect()
+        with conn:
+            self._marcar(conn, True)
+
+    def _marcar(self, conn: sqlite3.Connection, completo: bool):
+        conn.execute(
+            f"UPDATE {self.table}_meta SET value = ? WHERE name = 'completo'",
+            ("1" if completo else "0",),
+        )
+
+    def __iter__(self) -> Iterator[Dict]:
+        cursor = self.connect().execute(
+            f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM {self.table}"
+        )
+        for row in cursor:
+            yield dict(zip(MANIFEST_COLUMNS, row))
+
+    def summary(self, endpoint: Optional[str] = None) -> Dict:
+        """Totais do manifesto, opcionalmente só das entradas de um endpoint"""
+        total, unicos, tamanho, mais_antigo, mais_recente = (
+            self.connect()
+            .execute(
+                f"SELECT COUNT(*), COUNT(DISTINCT cnpj), COALESCE(SUM(size), 0), "
+                f"MIN(NULLIF(timestamp, '')), MAX(NULLIF(timestamp, '')) "
+                f"FROM {self.table} WHERE (:endpoint IS NULL OR endpoint = :endpoint)",
+                {"endpoint": endpoint},
+            )
+            .fetchone()
+        )
+        return {
+            "total": total,
+            "cnpjs_unicos": unicos,
+            "bytes": tamanho,
+            "mais_antigo": mais_antigo,
+            "mais_recente": mais_recente,
+        }
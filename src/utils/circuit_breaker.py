@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from config.settings import settings
+
+
+class CircuitOpenError(Exception):
+    """Requisição recusada porque o circuito do provedor está aberto"""
+
+
+class CircuitBreaker:
+    """Circuit breaker com janela deslizante de erros e chamadas lentas.
+
+    Estados: ``closed`` (requisições passam), ``open`` (requisições são
+    recusadas até o fim do cooldown) e ``half_open`` (algumas requisições de
+    teste decidem se o circuito fecha ou reabre). Os tempos usam o relógio de
+    parede para que o estado possa ser persistido entre execuções.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self._events = deque()  # (timestamp, sucesso, lenta)
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    def _prune(self, now: float):
+        limite = now - settings.CIRCUIT_WINDOW_SECONDS
+        while self._events and self._events[0][0] < limite:
+            self._events.popleft()
+
+    def _refresh_state(self, now: float):
+        if (
+            self.state == self.OPEN
+            and now - self.opened_at >= settings.CIRCUIT_OPEN_SECONDS
+        ):
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+        self._half_open_calls = 0
+
+    def is_available(self) -> bool:
+        """Indica se o provedor aceitaria uma requisição agora (sem reservá-la)"""
+        with self._lock:
+            self._refresh_state(time.time())
+            if self.state == self.OPEN:
+                return False
+            if self.state == self.HALF_OPEN:
+                return self._half_open_calls < settings.CIRCUIT_HALF_OPEN_MAX_CALLS
+            return True
+
+    def before_request(self):
+        """Reserva a passagem de uma requisição ou lança CircuitOpenError"""
+        with self._lock:
+            self._refresh_state(time.time())
+            if self.state == self.OPEN:
+                raise CircuitOpenError(f"circuito do provedor {self.name} aberto")
+            if self.state == self.HALF_OPEN:
+                if self._half_open_calls >= settings.CIRCUIT_HALF_OPEN_MAX_CALLS:
+                    raise CircuitOpenError(
+                        f"circuito do provedor {self.name} em teste (half-open)"
+                    )
+                self._half_open_calls += 1
+
+    def release(self):
+        """Libera a reserva de uma requisição interrompida sem resultado"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self, latency: Optional[float] = None):
+        slow = latency is not None and latency >= settings.CIRCUIT_SLOW_CALL_SECONDS
+        self._record(True, slow)
+
+    def record_failure(self):
+        self._record(False, False)
+
+    def _record(self, success: bool, slow: bool):
+        with self._lock:
+            now = time.time()
+            self.dirty = True
+
+            if self.state == self.HALF_OPEN:
+                if success and not slow:
+                    self.state = self.CLOSED
+                    self.opened_at = None
+                    self._events.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._events.append((now, success, slow))
+            self._prune(now)
+            if self.state == self.CLOSED and len(self._events) >= max(
+                1, settings.CIRCUIT_MIN_REQUESTS
+            ):
+                error_rate, slow_rate = self._rates()
+                if (
+                    error_rate >= settings.CIRCUIT_ERROR_THRESHOLD
+                    or slow_rate >= settings.CIRCUIT_SLOW_CALL_THRESHOLD
+                ):
+                    self._open(now)
+
+    def _rates(self):
+        total = len(self._events)
+        if not total:
+            return 0.0, 0.0
+        errors = sum(1 for _, success, _ in self._events if not success)
+        slow = sum(1 for _, _, is_slow in self._events if is_slow)
+        return errors / total, slow / total
+
+    def health_score(self) -> float:
+        """Nota de 0 a 1 combinando estado, taxa de erro e de chamadas lentas"""
+        with self._lock:
+            now = time.time()
+            self._refresh_state(now)
+            self._prune(now)
+            if self.state == self.OPEN:
+                return 0.0
+            error_rate, slow_rate = self._rates()
+            score = (1 - error_rate) * (1 - 0.5 * slow_rate)
+            return score * 0.5 if self.state == self.HALF_OPEN else score
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.opened_at = None
+            self._events.clear()
+            self._half_open_calls = 0
+            self.dirty = True
+
+    def snapshot(self) -> Dict:
+        """Estado atual serializável em JSON"""
+        health = self.health_score()
+        with self._lock:
+            error_rate, slow_rate = self._rates()
+            return {
+                "state": self.state,
+                "opened_at": self.opened_at,
+                "requests": len(self._events),
+                "error_rate": round(error_rate, 4),
+                "slow_rate": round(slow_rate, 4),
+                "health": round(health, 4),
+                "events": [list(event) for event in self._events],
+            }
+
+    def restore(self, data: Dict):
+        with self._lock:
+            self.state = data.get("state", self.CLOSED)
+            self.opened_at = data.get("opened_at")
+            if self.state == self.HALF_OPEN:
+                # Testes em andamento não sobrevivem ao processo anterior
+                self._half_open_calls = 0
+            self._events.extend(tuple(event) for event in data.get("events", []))
+            self._prune(time.time())
@@ -0,0 +1,377 @@
+import csv
+import gzip
+import json
+import os
+import re
+import uuid
+from dataclasses import fields
+from datetime import datetime
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+from src.data_models.empresa import ENDERECO_CAMPOS, BalancoPatrimonial, Empresa
+
+# Registros gravados entre flushes: o consumidor vê o arquivo crescer
+# durante a exportação
+FLUSH_EVERY = 500
+
+# Linhas acumuladas (somando todas as partições) antes de gravar no Parquet
+PARQUET_BATCH_ROWS = 10000
+
+# Layouts do CSV: uma linha por empresa (com o balanço mais recente) ou uma
+# linha por período de balanço
+CSV_LAYOUTS = ("empresa", "periodo")
+
+# Colunas achatadas, na ordem dos dataclasses; o endereço vira endereco_<campo>
+EMPRESA_COLUMNS = (
+    tuple(
+        f.name
+        for f in fields(Empresa)
+        if f.name not in ("endereco", "balanco_patrimonial")
+    )
+    + tuple(f"endereco_{campo}" for campo in ENDERECO_CAMPOS)
+    + ("timestamp",)
+)
+BALANCO_COLUMNS = tuple(f.name for f in fields(BalancoPatrimonial))
+PERIODO_COLUMNS = EMPRESA_COLUMNS + BALANCO_COLUMNS
+
+FLOAT_COLUMNS = frozenset(
+    f.name
+    for f in fields(Empresa) + fields(BalancoPatrimonial)
+    if f.type in (float, Optional[float])
+)
+CATEGORY_COLUMNS = frozenset(("segmento", "setor"))
+
+# Partição do Parquet (diretórios segmento=<valor>, convenção Hive). Segmento
+# ausente vira um valor explícito: partições nulas quebram a leitura de
+# datasets com chave categórica no pyarrow/pandas
+PARTITION_COLUMN = "segmento"
+PARTITION_DEFAULT = "nao_informado"
+
+# Marca d'água da exportação incremental, na raiz do dataset (arquivos com
+# prefixo "_" são ignorados pelos leitores de Parquet)
+WATERMARK_FILE = "_watermark.json"
+
+# Limite de linhas de uma planilha do Excel (incluindo o cabeçalho)
+EXCEL_MAX_ROWS = 1048576
+
+# Caracteres de controle rejeitados pelo formato xlsx
+_ILLEGAL_CHARACTERS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+
+def open_output(output_path: str, compress: bool = False) -> IO[str]:
+    """Abre o arquivo de saída em modo texto, com gzip opcional"""
+    if compress:
+        return gzip.open(output_path, "wt", encoding="utf-8", newline="")
+    return open(output_path, "w", encoding="utf-8", newline="")
+
+
+def export_to_json(
+    cached_data: Iterable[Dict], output_path: str, compress: bool = False
+) -> int:
+    """Exporta dados para JSON, gravando um registro por vez"""
+    total = 0
+    with open_output(output_path, compress) as f:
+        f.write("[")
+        for item in cached_data:
+            f.write(",\n" if total else "\n")
+            f.write(json.dumps(item, ensure_ascii=False, indent=2))
+            total += 1
+        f.write("\n]" if total else "]")
+    return total
+
+
+def export_to_jsonl(
+    cached_data: Iterable[Dict], output_path: str, compress: bool = False
+) -> int:
+    """Exporta dados para JSON Lines (um registro por linha) em memória
+    constante"""
+    total = 0
+    with open_output(output_path, compress) as f:
+        for item in cached_data:
+            f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            total += 1
+            if total % FLUSH_EVERY == 0:
+                f.flush()
+    return total
+
+
+def export_to_csv(
+    cached_data: Iterable[Dict],
+    output_path: str,
+    layout: str = "empresa",
+    compress: bool = False,
+) -> int:
+    """Exporta para CSV em uma única passada, com colunas fixas derivadas dos
+    dataclasses (PERIODO_COLUMNS) e campos aninhados achatados"""
+    if layout not in CSV_LAYOUTS:
+        raise ValueError(f"Layout de CSV desconhecido: {layout}")
+
+    total = 0
+    with open_output(output_path, compress) as f:
+        writer = csv.writer(f)
+        writer.writerow(PERIODO_COLUMNS)
+        for item in cached_data:
+            empresa = flatten_empresa(item)
+            base = [_tipado(coluna, empresa[coluna]) for coluna in EMPRESA_COLUMNS]
+            if layout == "empresa":
+                balancos = [_ultimo_balanco(item)]
+            else:
+                balancos = _balancos(item) or [{}]
+            writer.writerows(
+                base
+                + [_tipado(coluna, balanco.get(coluna)) for coluna in BALANCO_COLUMNS]
+                for balanco in balancos
+            )
+            total += 1
+    return total
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError(
+            "openpyxl é necessário para a exportação xlsx (pip install openpyxl)"
+        )
+    return openpyxl
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "pyarrow é necessário para a exportação Parquet (pip install pyarrow)"
+        )
+    return pyarrow, pyarrow.parquet
+
+
+def flatten_empresa(item: Dict) -> Dict:
+    """Achata uma entrada empresa_completa nas colunas de EMPRESA_COLUMNS"""
+    data = item.get("data") or {}
+    endereco = data.get("endereco") or {}
+    row = {coluna: data.get(coluna) for coluna in EMPRESA_COLUMNS}
+    row["atividade_principal"] = _texto_atividade(row["atividade_principal"])
+    for campo in ENDERECO_CAMPOS:
+        row[f"endereco_{campo}"] = endereco.get(campo)
+    row["timestamp"] = item.get("timestamp")
+    return row
+
+
+def _texto_atividade(valor):
+    """A ReceitaWS devolve a atividade como lista de {code, text}; vira
+    "code - text", com várias atividades separadas por ponto e vírgula"""
+    if isinstance(valor, dict):
+        valor = [valor]
+    if not isinstance(valor, list):
+        return valor
+    return "; ".join(
+        (
+            " - ".join(str(parte) for parte in (a.get("code"), a.get("text")) if parte)
+            if isinstance(a, dict)
+            else str(a)
+        )
+        for a in valor
+    )
+
+
+def _balancos(item: Dict) -> List[Dict]:
+    return (item.get("data") or {}).get("balanco_patrimonial") or []
+
+
+def _ultimo_balanco(item: Dict) -> Dict:
+    return max(_balancos(item), key=lambda b: str(b.get("periodo") or ""), default={})
+
+
+def flatten_periodos(item: Dict) -> Iterator[Dict]:
+    """Uma linha por (cnpj, periodo); empresas sem balanço geram uma linha
+    com os campos do balanço vazios"""
+    empresa = flatten_empresa(item)
+    for balanco in _balancos(item) or [{}]:
+        row = dict(empresa)
+        row.update((coluna, balanco.get(coluna)) for coluna in BALANCO_COLUMNS)
+        yield row
+
+
+def _tipado(coluna: str, valor):
+    """Converte o valor para o tipo da coluna (float ou texto)"""
+    if valor is None or valor == "":
+        return None
+    if coluna in FLOAT_COLUMNS:
+        try:
+            return float(valor)
+        except (TypeError, ValueError):
+            return None
+    return str(valor)
+
+
+def _tipo_arrow(pa, coluna: str):
+    if coluna in FLOAT_COLUMNS:
+        return pa.float64()
+    if coluna in CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def _parquet_schema(pa):
+    """Colunas de PERIODO_COLUMNS, exceto a de partição (fica no diretório)"""
+    return pa.schema(
+        [
+            (coluna, _tipo_arrow(pa, coluna))
+            for coluna in PERIODO_COLUMNS
+            if coluna != PARTITION_COLUMN
+        ]
+    )
+
+
+def _partition_dir(segmento: Optional[str]) -> str:
+    valor = quote(segmento, safe="") if segmento else PARTITION_DEFAULT
+    return f"{PARTITION_COLUMN}={valor}"
+
+
+def export_to_parquet(
+    cached_data: Iterable[Dict],
+    output_dir: str,
+    batch_rows: int = PARQUET_BATCH_ROWS,
+) -> int:
+    """Exporta para um dataset Parquet particionado por segmento, com uma
+    linha por (cnpj, periodo) e colunas tipadas.
+
+    As linhas são gravadas em lotes de ``batch_rows``; cada exportação cria
+    um arquivo novo por partição, então exportações no mesmo diretório se
+    somam ao dataset.
+    """
+    pa, pq = _pyarrow()
+    schema = _parquet_schema(pa)
+    nome_arquivo = f"part-{uuid.uuid4().hex}.parquet"
+    pendentes: Dict[str, List[Dict]] = {}
+    writers = {}
+    total = 0
+    acumuladas = 0
+
+    def gravar():
+        for particao, rows in pendentes.items():
+            if particao not in writers:
+                directory = os.path.join(output_dir, particao)
+                os.makedirs(directory, exist_ok=True)
+                writers[particao] = pq.ParquetWriter(
+                    os.path.join(directory, nome_arquivo), schema
+                )
+            tabela = pa.Table.from_pydict(
+                {
+                    coluna: [_tipado(coluna, row[coluna]) for row in rows]
+                    for coluna in schema.names
+                },
+                schema=schema,
+            )
+            writers[particao].write_table(tabela)
+        pendentes.clear()
+
+    try:
+        for item in cached_data:
+            for row in flatten_periodos(item):
+                particao = _partition_dir(row[PARTITION_COLUMN])
+                pendentes.setdefault(particao, []).append(row)
+                acumuladas += 1
+            total += 1
+            if acumuladas >= batch_rows:
+                gravar()
+                acumuladas = 0
+        gravar()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return total
+
+
+class _PlanilhaRotativa:
+    """Planilha write-only que continua em uma nova aba ("Nome (2)", ...)
+    ao atingir ``max_rows``"""
+
+    def __init__(self, workbook, titulo: str, colunas, max_rows: int):
+        self.workbook = workbook
+        self.titulo = titulo
+        self.colunas = colunas
+        self.max_rows = max_rows
+        self.abas = 0
+        self._nova_aba()
+
+    def _nova_aba(self):
+        self.abas += 1
+        sufixo = f" ({self.abas})" if self.abas > 1 else ""
+        self._sheet = self.workbook.create_sheet(self.titulo + sufixo)
+        self._sheet.append(list(self.colunas))
+        self._linhas = 1
+
+    def append(self, row: Dict):
+        if self._linhas >= self.max_rows:
+            self._nova_aba()
+        self._sheet.append([_celula(coluna, row[coluna]) for coluna in self.colunas])
+        self._linhas += 1
+
+
+def _celula(coluna: str, valor):
+    """Valor tipado e sem caracteres de controle, que o xlsx não aceita"""
+    valor = _tipado(coluna, valor)
+    if isinstance(valor, str):
+        return _ILLEGAL_CHARACTERS.sub("", valor)
+    return valor
+
+
+def export_to_excel(
+    cached_data: Iterable[Dict], output_path: str, max_rows: int = EXCEL_MAX_ROWS
+) -> int:
+    """Exporta para xlsx em modo write-only (memória constante), com uma aba
+    de dados cadastrais e outra com uma linha por período de balanço"""
+    openpyxl = _openpyxl()
+    workbook = openpyxl.Workbook(write_only=True)
+    empresas = _PlanilhaRotativa(workbook, "Empresas", EMPRESA_COLUMNS, max_rows)
+    balancos = _PlanilhaRotativa(
+        workbook, "Balancos", ("cnpj",) + BALANCO_COLUMNS, max_rows
+    )
+
+    total = 0
+    for item in cached_data:
+        empresa = flatten_empresa(item)
+        empresas.append(empresa)
+        for balanco in _balancos(item):
+            balancos.append(
+                {
+                    "cnpj": empresa["cnpj"],
+                    **{c: balanco.get(c) for c in BALANCO_COLUMNS},
+                }
+            )
+        total += 1
+
+    workbook.save(output_path)
+    return total
+
+
+def load_watermark(output_dir: str) -> Optional[str]:
+    """Timestamp (ISO) do registro mais recente já exportado para o dataset"""
+    try:
+        with open(os.path.join(output_dir, WATERMARK_FILE), encoding="utf-8") as f:
+            return json.load(f).get("timestamp")
+    except FileNotFoundError:
+        return None
+
+
+def save_watermark(output_dir: str, timestamp: str, registros: int):
+    """Grava a marca d'água de forma atômica, só depois dos dados"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "timestamp": timestamp,
+                "registros": registros,
+                "exportado_em": datetime.now().isoformat(),
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    os.replace(tmp_path, path)
@@ -1,17 +1,41 @@
+import atexit
 import os
 import json
 import hashlib
-from datetime import datetime
-from typing import Any, Dict, List
-import csv
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from config.settings import settings
+from src.utils.cache_backends import get_cache_backend, get_raw_cache_backend
+from src.utils.exporters import (
+    export_to_csv,
+    export_to_excel,
+    export_to_json,
+    export_to_jsonl,
+    export_to_parquet,
+    load_watermark,
+    save_watermark,
+)
+from src.utils.logger import logger
+from src.utils.memory_cache import LRUCache
+
+# Camada em memória na frente do backend: chave -> (dados já desserializados,
+# instante em que deixam de estar frescos)
+_memory_cache = LRUCache(
+    settings.MEMORY_CACHE_MAX_ENTRIES, settings.MEMORY_CACHE_MAX_BYTES
+)
+
+# Gravações desde a última limpeza automática do cache em disco
+_writes_since_prune = 0
+_prune_lock = threading.Lock()
 
 
 def ensure_directories():
     """Garante que todos os diretórios necessários existam"""
     os.makedirs(settings.DATA_DIR, exist_ok=True)
     os.makedirs(settings.CACHE_DIR, exist_ok=True)
-    os.makedirs(os.path.join(settings.DATA_DIR, "raw"), exist_ok=True)
+    os.makedirs(settings.RAW_CACHE_DIR, exist_ok=True)
     os.makedirs(os.path.join(settings.DATA_DIR, "processed"), exist_ok=True)
 
 
@@ -21,116 +45,278 @@ def get_cache_key(cnpj: str, endpoint: str) -> str:
     return hashlib.md5(key.encode()).hexdigest()
 
 
+def get_cache_ttl(endpoint: str) -> int:
+    """Validade, em segundos, das entradas de cache do endpoint"""
+    return settings.CACHE_TTL.get(endpoint, settings.CACHE_TTL_DEFAULT)
+
+
 def save_to_cache(cnpj: str, endpoint: str, data: Any):
     """Salva dados no cache"""
     if not settings.CACHE_ENABLED:
         return
 
     cache_key = get_cache_key(cnpj, endpoint)
-    cache_path = os.path.join(settings.CACHE_DIR, f"{cache_key}.json")
-
-    with open(cache_path, "w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "timestamp": datetime.now().isoformat(),
-                "cnpj": cnpj,
-                "endpoint": endpoint,
-                "data": data,
-            },
-            f,
-            ensure_ascii=False,
-            indent=2,
+    now = datetime.now()
+    get_cache_backend().save(
+        cache_key,
+        {
+            "timestamp": now.isoformat(),
+            "cnpj": cnpj,
+            "endpoint": endpoint,
+            "data": data,
+        },
+    )
+    _remember(cache_key, data, now.timestamp() + get_cache_ttl(endpoint))
+    _maybe_prune()
+
+
+def _maybe_prune():
+    """Aplica a limpeza do cache a cada CACHE_PRUNE_INTERVAL gravações"""
+    global _writes_since_prune
+    if settings.CACHE_PRUNE_INTERVAL <= 0:
+        return
+    with _prune_lock:
+        _writes_since_prune += 1
+        if _writes_since_prune < settings.CACHE_PRUNE_INTERVAL:
+            return
+        _writes_since_prune = 0
+    prune_cache()
+    if settings.RAW_CACHE_MAX_ENTRIES or settings.RAW_CACHE_MAX_BYTES:
+        prune_cache(raw=True)
+
+
+def prune_cache(
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    policy: Optional[str] = None,
+    raw: bool = False,
+) -> Dict[str, int]:
+    """Remove do disco as entradas vencidas além da janela de stale e aplica
+    os limites de tamanho (padrões de Settings). Com ``raw``, poda a camada
+    de respostas brutas, que não vence: só os limites RAW_CACHE_MAX_* valem.
+    """
+    policy = policy or settings.CACHE_EVICTION_POLICY
+    if raw:
+        return get_raw_cache_backend().prune(
+            max_entries=(
+                settings.RAW_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+            ),
+            max_bytes=settings.RAW_CACHE_MAX_BYTES if max_bytes is None else max_bytes,
+            policy=policy,
         )
 
+    now = datetime.now()
+
+    def corte(ttl: int) -> str:
+        return (now - timedelta(seconds=ttl + settings.CACHE_STALE_SECONDS)).isoformat()
+
+    return get_cache_backend().prune(
+        max_entries=settings.CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+        max_bytes=settings.CACHE_MAX_BYTES if max_bytes is None else max_bytes,
+        policy=policy,
+        cutoffs={endpoint: corte(ttl) for endpoint, ttl in settings.CACHE_TTL.items()},
+        default_cutoff=corte(settings.CACHE_TTL_DEFAULT),
+    )
+
 
 def load_from_cache(cnpj: str, endpoint: str) -> Any:
     """Carrega dados do cache"""
+    data, stale = load_from_cache_with_status(cnpj, endpoint)
+    return None if stale else data
+
+
+def load_from_cache_with_status(cnpj: str, endpoint: str) -> Tuple[Any, bool]:
+    """Carrega dados do cache indicando se já passaram do TTL.
+
+    Retorna (dados, vencido). Entradas vencidas há menos de
+    CACHE_STALE_SECONDS voltam com vencido=True para que o chamador as use
+    enquanto atualiza o cache; as mais antigas contam como ausentes.
+    """
     if not settings.CACHE_ENABLED:
-        return None
+        return None, False
 
     cache_key = get_cache_key(cnpj, endpoint)
-    cache_path = os.path.join(settings.CACHE_DIR, f"{cache_key}.json")
+    backend = get_cache_backend()
+    item = _memory_cache.get(cache_key)
+    if item is not None:
+        # Conta para a política LRU do disco como uma leitura comum
+        backend.registrar_acesso(cache_key)
+    else:
+        cached_data = backend.load(cache_key)
+        if not cached_data:
+            return None, False
+        cache_time = datetime.fromisoformat(cached_data["timestamp"])
+        fresh_until = cache_time.timestamp() + get_cache_ttl(endpoint)
+        item = (cached_data["data"], fresh_until)
+        _remember(cache_key, *item)
+
+    data, fresh_until = item
+    now = time.time()
+    if now < fresh_until:
+        return data, False
+    if now < fresh_until + settings.CACHE_STALE_SECONDS:
+        return data, True
+    return None, False
+
+
+def delete_from_cache(cnpj: str, endpoint: str) -> bool:
+    """Remove uma entrada do cache (disco e memória)"""
+    cache_key = get_cache_key(cnpj, endpoint)
+    _memory_cache.pop(cache_key)
+    return get_cache_backend().delete(cache_key)
 
-    if os.path.exists(cache_path):
-        with open(cache_path, "r", encoding="utf-8") as f:
-            cached_data = json.load(f)
-            # Verifica se o cache não expirou (24 horas)
-            cache_time = datetime.fromisoformat(cached_data["timestamp"])
-            if (datetime.now() - cache_time).total_seconds() < 86400:
-                return cached_data["data"]
-    return None
 
+def save_raw_response(provider: str, cnpj: str, data: Any):
+    """Guarda a resposta bruta de um provedor para o CNPJ"""
+    if not settings.RAW_CACHE_ENABLED:
+        return
+    get_raw_cache_backend().save(
+        get_cache_key(cnpj, provider),
+        {
+            "timestamp": datetime.now().isoformat(),
+            "cnpj": cnpj,
+            "endpoint": provider,
+            "data": data,
+        },
+    )
+    _maybe_prune()
 
-def format_cnpj(cnpj: str) -> str:
-    """Formata CNPJ para o padrão 00.000.000/0000-00"""
-    cnpj = "".join(filter(str.isdigit, cnpj))
-    if len(cnpj) != 14:
-        return cnpj
-    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
 
+def load_raw_response(provider: str, cnpj: str) -> Any:
+    """Última resposta bruta do provedor para o CNPJ (sem expiração)"""
+    entry = get_raw_cache_backend().load(get_cache_key(cnpj, provider))
+    return entry["data"] if entry else None
 
-def get_all_cached_data() -> List[Dict]:
-    """Retorna todos os dados em cache"""
-    cached_files = []
 
-    if os.path.exists(settings.CACHE_DIR):
-        for filename in os.listdir(settings.CACHE_DIR):
-            if filename.endswith(".json"):
-                filepath = os.path.join(settings.CACHE_DIR, filename)
-                try:
-                    with open(filepath, "r", encoding="utf-8") as f:
-                        cached_data = json.load(f)
-                        cached_files.append(cached_data)
-                except Exception as e:
-                    print(f"Erro ao ler arquivo {filename}: {e}")
+def iter_raw_cnpjs(providers: Iterable[str]) -> Iterator[str]:
+    """CNPJs distintos com resposta bruta de algum dos provedores"""
+    providers = set(providers)
+    vistos = set()
+    for item in get_raw_cache_backend().iter_manifest():
+        if item["endpoint"] in providers and item["cnpj"] not in vistos:
+            vistos.add(item["cnpj"])
+            yield item["cnpj"]
+
 
-    return cached_files
+NEGATIVE_CACHE_ENDPOINT = "negativo"
 
 
-def export_to_json(cached_data: List[Dict], output_path: str):
-    """Exporta dados para JSON"""
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(cached_data, f, ensure_ascii=False, indent=2)
+def save_negative_cache(cnpj: str, motivo: str):
+    """Registra que o CNPJ não pôde ser resolvido e por quê"""
+    if not settings.NEGATIVE_CACHE_ENABLED:
+        return
+    save_to_cache(
+        cnpj, NEGATIVE_CACHE_ENDPOINT, {"motivo": motivo, "registrado_em": time.time()}
+    )
 
 
-def export_to_csv(cached_data: List[Dict], output_path: str):
-    """Exporta dados para CSV"""
-    if not cached_data:
+def load_negative_cache(cnpj: str) -> Optional[Dict]:
+    """Entrada negativa do CNPJ ainda dentro do TTL do seu motivo"""
+    if not settings.NEGATIVE_CACHE_ENABLED:
+        return None
+    data = load_from_cache(cnpj, NEGATIVE_CACHE_ENDPOINT)
+    if not data:
+        return None
+    ttl = settings.NEGATIVE_CACHE_TTL.get(data.get("motivo"), 0)
+    if time.time() - data.get("registrado_em", 0) >= ttl:
+        return None
+    return data
+
+
+def _remember(cache_key: str, data: Any, fresh_until: float):
+    """Guarda a entrada na camada em memória até o fim da janela de stale"""
+    expires_at = fresh_until + settings.CACHE_STALE_SECONDS
+    if not _memory_cache.enabled or data is None or expires_at <= time.time():
         return
+    size = 0
+    if _memory_cache.max_bytes:
+        size = len(json.dumps(data, ensure_ascii=False, default=str))
+    _memory_cache.set(cache_key, (data, fresh_until), expires_at, size)
 
-    # Extrai todos os campos únicos
-    all_fields = set()
-    for item in cached_data:
-        if "data" in item:
-            all_fields.update(item["data"].keys())
 
-    fieldnames = ["cnpj", "timestamp", "endpoint"] + sorted(all_fields)
+def get_memory_cache_stats() -> Dict:
+    """Contadores da camada de cache em memória deste processo"""
+    return _memory_cache.stats()
+
+
+def _log_memory_cache_stats():
+    """Registra, ao sair, os contadores da camada em memória dos processos
+    que a usaram (os contadores não sobrevivem ao processo)"""
+    stats = get_memory_cache_stats()
+    if not stats["hits"] + stats["misses"]:
+        return
+    logger.info(
+        f"Cache em memória: {stats['hits']} hits, {stats['misses']} misses "
+        f"(taxa {stats['hit_rate']:.1%}), {stats['evictions']} evictions, "
+        f"{stats['expirations']} expiradas"
+    )
 
-    with open(output_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
 
-        for item in cached_data:
-            if "data" in item:
-                row = {
-                    "cnpj": item.get("cnpj", ""),
-                    "timestamp": item.get("timestamp", ""),
-                    "endpoint": item.get("endpoint", ""),
-                }
-                row.update(item["data"])
-                writer.writerow(row)
+atexit.register(_log_memory_cache_stats)
 
 
-def export_to_excel(cached_data: List[Dict], output_path: str):
-    """Exporta dados para Excel (CSV com formatação melhor)"""
-    export_to_csv(cached_data, output_path)
+def clear_cache(raw: bool = False):
+    """Remove todas as entradas do cache; com ``raw``, também as respostas
+    brutas usadas pelo rebuild"""
+    _memory_cache.clear()
+    get_cache_backend().clear()
+    if raw:
+        get_raw_cache_backend().clear()
 
 
-def combine_cache_data(output_format: str = "json", output_file: str = None):
+def normalize_cnpj(cnpj: str) -> str:
+    """Mantém apenas os dígitos do CNPJ, recompondo zeros à esquerda perdidos"""
+    cnpj = "".join(filter(str.isdigit, str(cnpj)))
+    return cnpj.zfill(14) if cnpj else cnpj
+
+
+def format_cnpj(cnpj: str) -> str:
+    """Formata CNPJ para o padrão 00.000.000/0000-00"""
+    cnpj = "".join(filter(str.isdigit, cnpj))
+    if len(cnpj) != 14:
+        return cnpj
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+
+def iter_cached_data(
+    endpoint: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[Dict]:
+    """Itera as entradas em cache, opcionalmente só as de um endpoint e com
+    timestamp em [since, until), sem carregar o cache inteiro em memória"""
+    return get_cache_backend().scan(
+        endpoint=endpoint,
+        since=since.isoformat() if since else None,
+        until=until.isoformat() if until else None,
+    )
+
+
+def get_all_cached_data() -> List[Dict]:
+    """Retorna todos os dados em cache"""
+    return list(iter_cached_data())
+
+
+def combine_cache_data(
+    output_format: str = "json",
+    output_file: str = None,
+    compress: bool = False,
+    layout: str = "empresa",
+    incremental: bool = False,
+):
     """Combina todos os dados em cache e exporta no formato especificado"""
-    cached_data = get_all_cached_data()
+    if incremental:
+        return export_incremental(output_file)
+
+    if output_format not in ("json", "jsonl", "parquet", "csv", "xlsx"):
+        print(f"Formato {output_format} não suportado.")
+        return False
 
-    if not cached_data:
+    if compress and output_format not in ("json", "jsonl", "csv"):
+        print(f"Compressão gzip não suportada para o formato {output_format}.")
+        return False
+
+    if not get_cache_backend().manifest_summary("empresa_completa")["total"]:
         print("Nenhum dado encontrado em cache.")
         return False
 
@@ -139,24 +325,83 @@ def combine_cache_data(output_format: str = "json", output_file: str = None):
         output_file = os.path.join(
             settings.DATA_DIR,
             "processed",
-            f"empresas_combined_{timestamp}.{output_format}",
+            f"empresas_combined_{timestamp}.{output_format}"
+            + (".gz" if compress else ""),
         )
 
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
 
     try:
-        if output_format == "json":
-            export_to_json(cached_data, output_file)
-        elif output_format == "csv":
-            export_to_csv(cached_data, output_file)
+        if output_format in ("json", "jsonl"):
+            exportar = export_to_json if output_format == "json" else export_to_jsonl
+            total = exportar(
+                iter_cached_data(endpoint="empresa_completa"), output_file, compress
+            )
+        elif output_format == "parquet":
+            # Diretório de dataset, particionado por segmento
+            total = export_to_parquet(
+                iter_cached_data(endpoint="empresa_completa"), output_file
+            )
         elif output_format == "xlsx":
-            export_to_excel(cached_data, output_file.replace(".xlsx", ".csv"))
+            total = export_to_excel(
+                iter_cached_data(endpoint="empresa_completa"), output_file
+            )
         else:
-            print(f"Formato {output_format} não suportado.")
-            return False
+            total = export_to_csv(
+                iter_cached_data(endpoint="empresa_completa"),
+                output_file,
+                layout,
+                compress,
+            )
 
         print(f"Dados exportados com sucesso: {output_file}")
-        print(f"Total de registros: {len(cached_data)}")
+        print(f"Total de registros: {total}")
+        return True
+
+    except Exception as e:
+        print(f"Erro ao exportar dados: {e}")
+        return False
+
+
+def _iter_novos(
+    watermark: Optional[str], until: datetime, marca: Dict
+) -> Iterator[Dict]:
+    """Entradas empresa_completa com timestamp posterior à marca d'água e
+    anterior a ``until``, guardando em ``marca`` o maior timestamp visto"""
+    since = datetime.fromisoformat(watermark) if watermark else None
+    for item in iter_cached_data(endpoint="empresa_completa", since=since, until=until):
+        timestamp = item.get("timestamp", "")
+        if watermark and timestamp <= watermark:
+            continue
+        if timestamp > marca["timestamp"]:
+            marca["timestamp"] = timestamp
+        yield item
+
+
+def export_incremental(output_dir: str = None) -> bool:
+    """Acrescenta ao dataset Parquet (particionado por segmento) só as
+    empresas gravadas no cache depois da última exportação.
+
+    Cada execução adiciona um arquivo por partição alterada; uma empresa
+    reexportada aparece de novo com ``timestamp`` mais recente, que é a
+    versão válida. Entradas dos últimos EXPORT_WATERMARK_LAG segundos ficam
+    para a próxima execução: uma gravação concorrente ainda pode efetivar uma
+    entrada com timestamp anterior às já vistas.
+    """
+    output_dir = output_dir or settings.EXPORT_INCREMENTAL_DIR
+    watermark = load_watermark(output_dir)
+    marca = {"timestamp": watermark or ""}
+    until = datetime.now() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG)
+
+    try:
+        total = export_to_parquet(_iter_novos(watermark, until, marca), output_dir)
+        if not total:
+            print(f"Nenhum registro novo desde {watermark or 'o início'}.")
+            return True
+
+        save_watermark(output_dir, marca["timestamp"], total)
+        print(f"Dados exportados com sucesso: {output_dir}")
+        print(f"Registros novos ou alterados: {total}")
         return True
 
     except Exception as e:
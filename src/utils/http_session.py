@@ -0,0 +1,61 @@
+import atexit
+import threading
+from typing import Optional, Tuple
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from config.settings import settings
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Retorna a sessão HTTP síncrona compartilhada (keep-alive com pool de conexões)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=settings.HTTP_POOL_SIZE,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_timeout() -> Tuple[float, float]:
+    """Timeouts (conexão, leitura) usados nas requisições síncronas"""
+    return settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT
+
+
+def create_async_session() -> aiohttp.ClientSession:
+    """Cria uma sessão aiohttp com o mesmo pool e timeouts da sessão síncrona.
+
+    Sessões aiohttp ficam presas ao event loop que as criou, por isso cada
+    execução assíncrona abre a sua (``async with create_async_session()``).
+    """
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_SIZE,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings.REQUEST_TIMEOUT,
+        sock_connect=settings.HTTP_CONNECT_TIMEOUT,
+        sock_read=settings.HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def close_sessions():
+    """Fecha a sessão compartilhada liberando as conexões abertas"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+atexit.register(close_sessions)
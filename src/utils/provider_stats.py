@@ -0,0 +1,108 @@
+import atexit
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from config.settings import settings
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.logger import logger
+
+STATS_FILE = os.path.join(settings.DATA_DIR, "provider_stats.json")
+
+
+class LatencyTracker:
+    """Janela deslizante com as latências (em segundos) das respostas de um provedor"""
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.dirty = True
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentil ``p`` (0-100) das latências ou None se houver poucas amostras"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < settings.LATENCY_MIN_SAMPLES:
+            return None
+        rank = max(0, math.ceil(p / 100 * len(samples)) - 1)
+        return samples[rank]
+
+    def samples(self) -> List[float]:
+        with self._lock:
+            return list(self._samples)
+
+    def restore(self, samples: List[float]):
+        with self._lock:
+            self._samples.extend(samples)
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(provider: str) -> LatencyTracker:
+    """Retorna o tracker de latência do provedor, restaurando amostras persistidas"""
+    with _trackers_lock:
+        if provider not in _trackers:
+            tracker = LatencyTracker(settings.LATENCY_WINDOW)
+            tracker.restore(_load_stats().get(provider, {}).get("latencies", []))
+            _trackers[provider] = tracker
+        return _trackers[provider]
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Retorna o circuit breaker do provedor, restaurando o estado persistido"""
+    with _trackers_lock:
+        if provider not in _breakers:
+            breaker = CircuitBreaker(provider)
+            breaker.restore(_load_stats().get(provider, {}).get("circuit", {}))
+            _breakers[provider] = breaker
+        return _breakers[provider]
+
+
+def _load_stats() -> Dict:
+    if not os.path.exists(STATS_FILE):
+        return {}
+    try:
+        with open(STATS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Erro ao ler estatísticas dos provedores: {e}")
+        return {}
+
+
+def save_provider_stats():
+    """Persiste latências e circuit breakers para que a próxima execução os reaproveite"""
+    with _trackers_lock:
+        trackers = {name: t for name, t in _trackers.items() if t.dirty}
+        breakers = {name: b for name, b in _breakers.items() if b.dirty}
+    if not trackers and not breakers:
+        return
+
+    stats = _load_stats()
+    for name, tracker in trackers.items():
+        stats.setdefault(name, {})["latencies"] = tracker.samples()
+    for name, breaker in breakers.items():
+        stats.setdefault(name, {})["circuit"] = breaker.snapshot()
+
+    try:
+        os.makedirs(settings.DATA_DIR, exist_ok=True)
+        tmp_path = f"{STATS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, STATS_FILE)
+        for item in list(trackers.values()) + list(breakers.values()):
+            item.dirty = False
+    except Exception as e:
+        logger.warning(f"Erro ao salvar estatísticas dos provedores: {e}")
+
+
+atexit.register(save_provider_stats)
@@ -0,0 +1,129 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from config.settings import settings
+
+
+class TokenBucket:
+    """Token bucket thread-safe usado para limitar requisições por provedor.
+
+    ``rate`` é dado em requisições por segundo e ``capacity`` é o tamanho do
+    burst permitido. Um rate <= 0 desativa o limite.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _reserve(self) -> float:
+        """Reserva um token e retorna quantos segundos aguardar antes de usá-lo"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.rate <= 0:
+                return wait
+
+            self._refill(now)
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def try_acquire(self) -> bool:
+        """Pega um token só se houver um disponível agora, sem esperar"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return False
+            if self.rate <= 0:
+                return True
+
+            self._refill(now)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def refund(self):
+        """Devolve um token reservado que não chegou a ser usado"""
+        with self._lock:
+            if self.rate > 0:
+                self._tokens = min(self.capacity, self._tokens + 1)
+
+    def acquire(self):
+        """Aguarda (bloqueando a thread) até haver um token disponível"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Aguarda (sem bloquear o event loop) até haver um token disponível"""
+        delay = self._reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Ex.: requisição perdedora do hedging, ainda na fila
+                self.refund()
+                raise
+
+    def pause(self, seconds: float):
+        """Suspende novas requisições ao provedor pelos próximos ``seconds``"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    base_url: str, rate: float, capacity: Optional[float] = None
+) -> TokenBucket:
+    """Retorna o token bucket compartilhado da URL base informada"""
+    with _limiters_lock:
+        if base_url not in _limiters:
+            _limiters[base_url] = TokenBucket(rate, capacity)
+        return _limiters[base_url]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos"""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Calcula a espera antes da próxima tentativa (exponencial com jitter),
+    nunca maior que RETRY_BACKOFF_MAX"""
+    if retry_after is not None:
+        return min(retry_after, settings.RETRY_BACKOFF_MAX)
+
+    cap = min(settings.RETRY_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * 2**attempt)
+    return random.uniform(0, cap)
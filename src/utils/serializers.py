@@ -0,0 +1,93 @@
+import gzip
+import json
+from typing import Any
+from config.settings import settings
+
+FORMATOS = ("json", "msgpack")
+COMPRESSOES = ("none", "gzip", "zstd")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError(
+            "msgpack é necessário para o formato de cache msgpack "
+            "(pip install msgpack)"
+        )
+    return msgpack
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "zstandard é necessário para a compressão zstd do cache "
+            "(pip install zstandard)"
+        )
+    return zstandard
+
+
+class Serializer:
+    """Codifica entradas de cache em bytes (JSON compacto ou MessagePack),
+    com compressão gzip ou zstd opcional.
+
+    A leitura não depende da configuração: ``loads`` detecta compressão e
+    formato pelos primeiros bytes, então entradas antigas continuam legíveis.
+    """
+
+    def __init__(self, formato: str = "json", compressao: str = "none"):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de cache desconhecido: {formato}")
+        if compressao not in COMPRESSOES:
+            raise ValueError(f"Compressão de cache desconhecida: {compressao}")
+        self.formato = formato
+        self.compressao = compressao
+
+        # Falha já na configuração se a dependência opcional não existir
+        if formato == "msgpack":
+            _msgpack()
+        if compressao == "zstd":
+            _zstd()
+
+    @property
+    def extension(self) -> str:
+        """Extensão dos arquivos: .json só para JSON sem compressão"""
+        if self.formato == "json" and self.compressao == "none":
+            return ".json"
+        return ".cache"
+
+    def dumps(self, obj: Any) -> bytes:
+        if self.formato == "msgpack":
+            raw = _msgpack().packb(obj, use_bin_type=True)
+        else:
+            raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            )
+
+        if self.compressao == "gzip":
+            return gzip.compress(raw, compresslevel=6)
+        if self.compressao == "zstd":
+            return _zstd().ZstdCompressor(level=3).compress(raw)
+        return raw
+
+    @staticmethod
+    def loads(raw: bytes) -> Any:
+        """Decodifica bytes em qualquer formato/compressão suportado"""
+        if raw[:2] == _GZIP_MAGIC:
+            raw = gzip.decompress(raw)
+        elif raw[:4] == _ZSTD_MAGIC:
+            raw = _zstd().ZstdDecompressor().decompress(raw)
+
+        if raw.lstrip()[:1] in (b"{", b"["):
+            return json.loads(raw)
+        return _msgpack().unpackb(raw, raw=False)
+
+
+def get_serializer() -> Serializer:
+    """Serializador configurado em CACHE_SERIALIZER/CACHE_COMPRESSION"""
+    return Serializer(settings.CACHE_SERIALIZER, settings.CACHE_COMPRESSION)
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave numa única execução.
+
+    A primeira thread a pedir uma chave executa ``fn``; as demais que chegarem
+    enquanto ela está em andamento aguardam e recebem o mesmo resultado (ou a
+    mesma exceção). Nada é guardado depois que a chamada termina.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def _entrar(self, key: str):
+        """Retorna (future da chave, se quem chamou é o líder)"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        return future, leader
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        future, leader = self._entrar(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def do_async(
+        self, key: str, fn: Callable[..., Awaitable], *args, **kwargs
+    ) -> Any:
+        """Versão para corrotinas de ``do``: compartilha as chamadas em
+        andamento com as threads, sem bloquear o event loop ao aguardar"""
+        future, leader = self._entrar(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            # Inclui o cancelamento: quem aguarda não pode ficar preso
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        """Número de chaves com chamadas em andamento"""
+        with self._lock:
+            return len(self._calls)
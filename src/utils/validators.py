@@ -0,0 +1,84 @@
+from typing import Iterable, List, Tuple
+import numpy as np
+from src.utils.helpers import normalize_cnpj
+
+# Pesos dos dígitos verificadores do CNPJ (módulo 11)
+_PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_DV2 = (6,) + _PESOS_DV1
+_PESOS_DV1_NP = np.array(_PESOS_DV1, dtype=np.int32)
+_PESOS_DV2_NP = np.array(_PESOS_DV2, dtype=np.int32)
+
+
+def _digito_verificador(digitos: List[int], pesos: Tuple[int, ...]) -> int:
+    resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def is_valid_cnpj(cnpj: str) -> bool:
+    """Valida os dígitos verificadores de um CNPJ (com ou sem formatação)"""
+    cnpj = normalize_cnpj(cnpj)
+    if len(cnpj) != 14 or cnpj == cnpj[0] * 14:
+        return False
+
+    digitos = [int(c) for c in cnpj]
+    dv1 = _digito_verificador(digitos[:12], _PESOS_DV1)
+    dv2 = _digito_verificador(digitos[:13], _PESOS_DV2)
+    return digitos[12] == dv1 and digitos[13] == dv2
+
+
+def _validar_bloco(bloco) -> Tuple[np.ndarray, np.ndarray]:
+    """Normaliza e valida um bloco de CNPJs usando apenas operações vetorizadas"""
+    texto = np.asarray(bloco, dtype="U")
+    n = len(texto)
+    largura = texto.dtype.itemsize // 4
+    codigos = texto.view(np.uint32).reshape(n, largura)
+
+    eh_digito = (codigos >= 48) & (codigos <= 57)
+    quantidade = eh_digito.sum(axis=1)
+    tamanho_ok = (quantidade > 0) & (quantidade <= 14)
+
+    # Coluna de destino de cada dígito: alinhado à direita, como normalize_cnpj,
+    # o que recompõe os zeros à esquerda perdidos
+    destino = np.cumsum(eh_digito, axis=1) - 1 + (14 - quantidade)[:, None]
+    linhas, colunas = np.nonzero(eh_digito & tamanho_ok[:, None])
+    digitos = np.zeros((n, 14), dtype=np.uint8)
+    digitos[linhas, destino[linhas, colunas]] = codigos[linhas, colunas] - 48
+
+    valores = digitos.astype(np.int32)
+    resto1 = (valores[:, :12] @ _PESOS_DV1_NP) % 11
+    resto2 = (valores[:, :13] @ _PESOS_DV2_NP) % 11
+    dv1 = np.where(resto1 < 2, 0, 11 - resto1)
+    dv2 = np.where(resto2 < 2, 0, 11 - resto2)
+    repetidos = (valores == valores[:, :1]).all(axis=1)
+
+    validos = (
+        tamanho_ok & (valores[:, 12] == dv1) & (valores[:, 13] == dv2) & ~repetidos
+    )
+    normalizados = (digitos + 48).view("S14").ravel().astype("U14")
+    return normalizados, validos
+
+
+def validate_cnpjs(
+    cnpjs: Iterable, chunk_size: int = 500_000
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Normaliza e valida CNPJs em lote com NumPy.
+
+    Retorna (normalizados, validos): um array de strings com 14 dígitos e a
+    máscara booleana de quais passaram na validação dos dígitos
+    verificadores. O processamento é feito em blocos de ``chunk_size`` para
+    limitar a memória intermediária com milhões de entradas.
+    """
+    cnpjs = list(cnpjs)
+    if not cnpjs:
+        return np.array([], dtype="U14"), np.array([], dtype=bool)
+
+    normalizados = []
+    validos = []
+    for inicio in range(0, len(cnpjs), chunk_size):
+        bloco_normalizado, bloco_valido = _validar_bloco(
+            cnpjs[inicio : inicio + chunk_size]
+        )
+        normalizados.append(bloco_normalizado)
+        validos.append(bloco_valido)
+
+    return np.concatenate(normalizados), np.concatenate(validos)